@@ -0,0 +1,51 @@
+"""Draws/second of the compiled samplers against the per-call scalar path.
+
+Usage: python benchmarks/bench_distribution.py [--draws N]
+"""
+
+import argparse
+from time import perf_counter
+
+from rlsim.engine.utils import Distribution, DistributionGenerator
+
+CASES = [
+    ("constant", [1.0]),
+    ("uniform", [1.0, 0.2]),
+    ("gamma", [0.78, 0.45]),
+    ("erlang", [10, 5.77]),
+    ("expo", [10]),
+    ("normal", [10, 1]),
+]
+
+
+def draws_per_second(fn, draws: int) -> float:
+    start = perf_counter()
+    for _ in range(draws):
+        fn()
+    return draws / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--draws", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scalar = DistributionGenerator(seed=args.seed)
+    dist = Distribution(seed=args.seed)
+
+    print(f"{'dist':<10}{'scalar/s':>14}{'sampler/s':>14}{'speedup':>10}")
+    for name, params in CASES:
+        scalar_rate = draws_per_second(
+            lambda: scalar.random_number(name, params), args.draws
+        )
+        sampler = dist.sampler(name, params)
+        sampler_rate = draws_per_second(sampler, args.draws)
+        print(
+            f"{name:<10}{scalar_rate:>14,.0f}{sampler_rate:>14,.0f}"
+            f"{sampler_rate / scalar_rate:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Events per second of the light kernel against simpy.
+
+The DBR plant and the example plant run `--run-until` hours on each
+kernel. Both kernels number events the same way, so the event count and
+the deliveries must match; events per second is the count over the run
+time.
+
+Usage: python benchmarks/bench_kernel.py [--run-until 100000] [--repeat 3]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parents[1]
+DBR_PATH = ROOT / "simulations" / "dbr_mta"
+sys.path.insert(0, str(DBR_PATH))
+
+from rlsim.environment import Environment, load_config  # noqa: E402
+from scheduler import DBR_MTA  # noqa: E402
+from stores import DBR_stores  # noqa: E402
+
+PLANTS = {
+    "dbr": dict(
+        config=DBR_PATH / "config",
+        stores=DBR_stores,
+        scheduler=DBR_MTA,
+        scheduler_kwargs={
+            "schedule_interval": 72,
+            "constraint_buffer_size": float("inf"),
+            "ccr_release_limit": float("inf"),
+        },
+        outbound_kwargs={"delivery_mode": "instantly"},
+    ),
+    "example": dict(config=ROOT / "example" / "config"),
+}
+
+
+def run(plant: str, kernel: str, args) -> tuple:
+    kwargs = dict(PLANTS[plant])
+    config = kwargs.pop("config")
+    env = Environment(
+        run_until=args.run_until,
+        resources_cfg=load_config(config / "resources.yaml"),
+        products_cfg=load_config(config / "products.yaml"),
+        log_interval=48,
+        warmup=args.run_until // 10,
+        seed=args.seed,
+        kernel=kernel,
+        **kwargs,
+    )
+
+    start = perf_counter()
+    env.env.run(until=args.run_until)
+    elapsed = perf_counter() - start
+
+    events = next(env.env._eid)
+    delivered = sum(
+        env.stores.log_products.delivered_ontime[p].sum
+        + env.stores.log_products.delivered_late[p].sum
+        for p in env.stores.products
+    )
+    return events, elapsed, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run-until", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plant", choices=tuple(PLANTS), nargs="+", default=PLANTS)
+    args = parser.parse_args()
+
+    print(
+        f"{'plant':>8} {'kernel':>8} {'events':>10} {'seconds':>10} "
+        f"{'events/s':>10} {'delivered':>10}"
+    )
+    for plant in args.plant:
+        results = {}
+        for kernel in ("simpy", "light"):
+            # Best of `repeat` runs
+            runs = [run(plant, kernel, args) for _ in range(args.repeat)]
+            events, elapsed, delivered = min(runs, key=lambda r: r[1])
+            results[kernel] = (events, elapsed, delivered)
+            print(
+                f"{plant:>8} {kernel:>8} {events:>10} {elapsed:>10.3f} "
+                f"{events / elapsed:>10.0f} {delivered:>10.0f}"
+            )
+
+        simpy_events, simpy_time, simpy_delivered = results["simpy"]
+        light_events, light_time, light_delivered = results["light"]
+        if (simpy_events, simpy_delivered) != (light_events, light_delivered):
+            print(f"{plant}: kernels differ")
+            sys.exit(1)
+        print(f"{plant}: light kernel {simpy_time / light_time:.2f}x simpy")
+
+
+if __name__ == "__main__":
+    main()
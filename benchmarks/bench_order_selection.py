@@ -0,0 +1,124 @@
+"""DBR order selection cost at increasing WIP levels.
+
+Compares the previous order selection, which rebuilt the orders ahead from
+every store on each call, with the incremental WIP index.
+
+Usage: python benchmarks/bench_order_selection.py [--queue 20]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import List
+
+import numpy as np
+import simpy
+
+DBR_PATH = Path(__file__).resolve().parents[1] / "simulations" / "dbr_mta"
+sys.path.insert(0, str(DBR_PATH))
+
+from rlsim.engine.control import ProductionOrder  # noqa: E402
+from rlsim.environment import load_config  # noqa: E402
+from simulation import SimulationDBR  # noqa: E402
+from stores import DBR_stores  # noqa: E402
+
+
+def scan_order_selection(store: DBR_stores, resource) -> int:
+    """Order selection before the WIP index, O(queue x total WIP)."""
+    orders: List[ProductionOrder] = store.resource_input[resource].items
+
+    for id, production_order in enumerate(orders):
+        ahead_orders: List[ProductionOrder] = []
+        for resource_ in store.resources.keys():
+            ahead_orders.extend(store.resource_input[resource_].items)
+            ahead_orders.extend(store.resource_output[resource_].items)
+            ahead_orders.extend(store.resource_transport[resource_].items)
+            if store.processing[resource_] is not None:
+                ahead_orders.append(store.processing[resource_])
+
+        product = production_order.product
+        released = production_order.released
+
+        ahead_quantity = [
+            order.quantity
+            for order in ahead_orders
+            if order.released < released and order.product == product
+        ]
+
+        orders[id].priority = (
+            sum(ahead_quantity) + store.finished_goods[product].level
+        ) / store.shipping_buffer[product]
+
+    selected_order = min(orders, key=lambda x: x.priority)
+    return selected_order.id
+
+
+def build_stores(wip: int, queue: int, seed: int):
+    rng = random.Random(seed)
+    stores = DBR_stores(
+        env=simpy.Environment(),
+        resources=load_config(DBR_PATH / "config" / "resources.yaml"),
+        products=load_config(DBR_PATH / "config" / "products.yaml"),
+    )
+    plant = stores.plant
+    products = list(stores.products)
+    target = next(iter(stores.resources))
+    target_id = plant.resource_ids[target]
+
+    for i in range(wip):
+        product = rng.choice(products)
+        product_id = plant.product_ids[product]
+        route = plant.next_resource[product_id, : plant.n_steps[product_id]]
+        # The first `queue` orders wait at the target resource
+        if i < queue:
+            step = int(np.flatnonzero(route == target_id)[0])
+        else:
+            step = rng.randrange(len(route))
+        order = ProductionOrder(
+            product=product,
+            quantity=rng.randint(1, 50),
+            released=i * 0.5,
+            process_total=len(route),
+            process_finished=step,
+            id=next(stores.production_order_ids),
+            product_id=product_id,
+        )
+        stores.wip_index.add(order)
+        stores.input_queues[route[step]].put(order)
+
+    return stores, target
+
+
+def time_call(fn, stores, resource, repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        selected = fn(stores, resource)
+    return (perf_counter() - start) / repeat, selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queue", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    indexed = SimulationDBR._create_order_selection_fn()
+
+    print(f"{'wip':>6}{'queue':>7}{'scan ms':>12}{'index ms':>12}{'speedup':>10}")
+    for wip in (100, 300, 1000, 3000, 10000):
+        stores, resource = build_stores(wip, args.queue, args.seed)
+        repeat = max(1, 20000 // wip)
+        scan_time, scan_id = time_call(scan_order_selection, stores, resource, repeat)
+        index_time, index_id = time_call(indexed, stores, resource, repeat * 10)
+        assert scan_id == index_id
+        print(
+            f"{wip:>6}{len(stores.resource_input[resource]):>7}"
+            f"{scan_time * 1e3:>12.3f}{index_time * 1e3:>12.3f}"
+            f"{scan_time / index_time:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Allocation cost and peak memory of slotted orders against plain dataclasses.
+
+The DBR plant runs `--run-until` hours in training mode, where metrics
+are fixed-size counters and orders are most of what is allocated. Each
+order class runs in a fresh interpreter so the peak resident set sizes
+are comparable. Orders are then created in isolation, measuring time and
+traced bytes per live order. The plain dataclasses are the slotted
+classes rebuilt without `slots`, as they were before.
+
+Usage: python benchmarks/bench_orders.py [--run-until 1000000]
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tracemalloc
+from dataclasses import MISSING, field, fields, make_dataclass
+from pathlib import Path
+from time import perf_counter
+
+DBR_PATH = Path(__file__).resolve().parents[1] / "simulations" / "dbr_mta"
+sys.path.insert(0, str(DBR_PATH))
+
+from rlsim.engine.control import DemandOrder, ProductionOrder  # noqa: E402
+from rlsim.environment import Environment, load_config  # noqa: E402
+from scheduler import DBR_MTA  # noqa: E402
+from stores import DBR_stores  # noqa: E402
+
+N_ORDERS = 200_000
+
+
+def use_dict_orders() -> type:
+    """Replace the order classes, in every module using them, with
+    dataclasses keeping their fields in a `__dict__`.
+    """
+    replaced = {}
+    for cls in (ProductionOrder, DemandOrder):
+        plain = make_dataclass(
+            cls.__name__,
+            [
+                (
+                    (f.name, f.type, field(default=f.default))
+                    if f.default is not MISSING
+                    else (f.name, f.type)
+                )
+                for f in fields(cls)
+            ],
+            namespace={"to_dict": cls.to_dict},
+        )
+        for module in list(sys.modules.values()):
+            if getattr(module, cls.__name__, None) is cls:
+                setattr(module, cls.__name__, plain)
+        replaced[cls.__name__] = plain
+    return replaced["ProductionOrder"]
+
+
+def create_orders(order_class) -> tuple:
+    """Seconds and traced bytes per order for N_ORDERS live orders."""
+
+    def create():
+        return [
+            order_class(product="produto01", quantity=i, duedate=float(i))
+            for i in range(N_ORDERS)
+        ]
+
+    start = perf_counter()
+    orders = create()
+    elapsed = perf_counter() - start
+    del orders
+
+    tracemalloc.start()
+    orders = create()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del orders
+    return elapsed / N_ORDERS, size / N_ORDERS
+
+
+def run(args) -> None:
+    order_class = use_dict_orders() if args.orders == "dict" else ProductionOrder
+
+    env = Environment(
+        run_until=args.run_until,
+        resources_cfg=load_config(DBR_PATH / "config" / "resources.yaml"),
+        products_cfg=load_config(DBR_PATH / "config" / "products.yaml"),
+        log_interval=48,
+        training=True,
+        stores=DBR_stores,
+        scheduler=DBR_MTA,
+        scheduler_kwargs={
+            "schedule_interval": 72,
+            "constraint_buffer_size": float("inf"),
+            "ccr_release_limit": float("inf"),
+        },
+        outbound_kwargs={"delivery_mode": "instantly"},
+        seed=args.seed,
+    )
+    start = perf_counter()
+    env.env.run(until=args.run_until)
+    elapsed = perf_counter() - start
+
+    orders = (
+        next(env.stores.production_order_ids) + next(env.stores.demand_order_ids) - 2
+    )
+    # Read before the isolated orders raise it
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    seconds, size = create_orders(order_class)
+    print(
+        f"{args.orders:>8} {seconds * 1e9:>10.0f} {size:>10.0f} {orders:>10} "
+        f"{orders / elapsed:>10.0f} {elapsed:>10.1f} {peak:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run-until", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--orders", choices=("slots", "dict"), default=None)
+    args = parser.parse_args()
+
+    if args.orders is not None:
+        run(args)
+        return
+
+    print(
+        f"{'class':>8} {'ns/order':>10} {'B/order':>10} {'orders':>10} "
+        f"{'orders/s':>10} {'seconds':>10} {'peak MiB':>10}"
+    )
+    for orders in ("dict", "slots"):
+        subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], "--orders", orders],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Environment.reset throughput, full rebuild vs fast reset.
+
+With --agent-dispatching every reset also runs to the first decision, as
+in RL rollouts.
+
+Usage: python benchmarks/bench_reset.py [--resets 100] [--agent-dispatching]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_step import build_env  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resets", type=int, default=100)
+    parser.add_argument("--agent-dispatching", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'resets':>8} {'seconds':>10} {'resets/s':>10}")
+    for fast_reset in (False, True):
+        env = build_env(8)
+        env.fast_reset = fast_reset
+        env.reset(seed=args.seed, agent_dispatching=args.agent_dispatching)
+
+        start = perf_counter()
+        for replication in range(args.resets):
+            env.reset(options={"replication": replication})
+        elapsed = perf_counter() - start
+
+        mode = "fast" if fast_reset else "full"
+        print(
+            f"{mode:>6} {args.resets:>8} {elapsed:>10.3f} "
+            f"{args.resets / elapsed:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Event count and run time of direct routing on the example plant.
+
+The example configs run with the default components, routing finished
+operations through the output and transport stores and then directly to
+the next queue. Scheduled events are read from the simpy event id counter,
+processed events are counted while stepping.
+
+Usage: python benchmarks/bench_routing.py [--run-until 20000]
+"""
+
+import argparse
+from pathlib import Path
+from time import perf_counter
+
+from rlsim.environment import Environment, load_config
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "example" / "config"
+
+
+def run(args, direct_routing: bool):
+    env = Environment(
+        run_until=args.run_until,
+        resources_cfg=load_config(CONFIG_PATH / "resources.yaml"),
+        products_cfg=load_config(CONFIG_PATH / "products.yaml"),
+        monitor_interval=0,
+        log_interval=48,
+        warmup=args.run_until // 4,
+        seed=args.seed,
+        production_kwargs={"direct_routing": direct_routing},
+    )
+
+    sim = env.env
+    processed = 0
+    start = perf_counter()
+    while sim.peek() < args.run_until:
+        sim.step()
+        processed += 1
+    elapsed = perf_counter() - start
+
+    scheduled = next(sim._eid)
+    delivered = sum(
+        env.stores.log_products.delivered_ontime[p].sum
+        + env.stores.log_products.delivered_late[p].sum
+        for p in env.stores.products
+    )
+    return scheduled, processed, elapsed, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run-until", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'routing':>10} {'scheduled':>10} {'processed':>10} "
+        f"{'seconds':>10} {'delivered':>10}"
+    )
+    results = {}
+    for name, direct_routing in (("stores", False), ("direct", True)):
+        results[name] = run(args, direct_routing)
+        scheduled, processed, elapsed, delivered = results[name]
+        print(
+            f"{name:>10} {scheduled:>10} {processed:>10} "
+            f"{elapsed:>10.3f} {delivered:>10.0f}"
+        )
+
+    ratio = results["direct"][1] / results["stores"][1]
+    print(f"direct routing processes {ratio:.1%} of the events")
+
+
+if __name__ == "__main__":
+    main()
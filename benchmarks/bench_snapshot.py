@@ -0,0 +1,72 @@
+"""Snapshot size and snapshot / restore time on the DBR plant.
+
+The plant runs `--steps` random dispatching decisions, then every repeat
+takes a snapshot, restores it and rolls out `--rollout` steps, as a
+lookahead search would. Replaying the episode from a reset is timed for
+comparison.
+
+Usage: python benchmarks/bench_snapshot.py [--steps 20000] [--repeats 200]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_step import build_env  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--rollout", type=int, default=50)
+    parser.add_argument("--max-candidates", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    actions = [rng.randrange(args.max_candidates) for _ in range(args.steps)]
+
+    env = build_env(args.max_candidates)
+    env.reset(seed=args.seed)
+    start = perf_counter()
+    for action in actions:
+        env.step(action)
+    replay_time = perf_counter() - start
+
+    snapshot_times, restore_times, rollout_times = [], [], []
+    for _ in range(args.repeats):
+        start = perf_counter()
+        snapshot = env.snapshot()
+        snapshot_times.append(perf_counter() - start)
+
+        for _ in range(args.rollout):
+            env.step(rng.randrange(args.max_candidates))
+
+        start = perf_counter()
+        env.restore(snapshot)
+        restore_times.append(perf_counter() - start)
+
+        start = perf_counter()
+        for _ in range(args.rollout):
+            env.step(rng.randrange(args.max_candidates))
+        rollout_times.append(perf_counter() - start)
+        env.restore(snapshot)
+
+    stores = env.stores
+    wip = sum(len(queue) for queue in stores.resource_input.values())
+    print(f"time {env.env.now:.0f} h, {wip} queued orders, {args.steps} steps")
+    print(f"snapshot size: {snapshot.nbytes / 1024:.1f} KiB")
+    print(f"snapshot: {1e3 * median(snapshot_times):.3f} ms")
+    print(f"restore: {1e3 * median(restore_times):.3f} ms")
+    print(f"{args.rollout} step rollout: {1e3 * median(rollout_times):.3f} ms")
+    print(f"replay from reset: {1e3 * replay_time:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
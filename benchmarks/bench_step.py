@@ -0,0 +1,88 @@
+"""Step throughput of the Gymnasium-style API on the DBR plant.
+
+Every resource dispatch with more than one queued order is a decision, and
+the action picks the order at random. With `--agent-release` the release
+ticks of the DBR scheduler are decisions too, releasing a random number of
+orders.
+
+Usage: python benchmarks/bench_step.py [--steps 50000] [--aggregate-processing]
+    [--agent-release]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+DBR_PATH = Path(__file__).resolve().parents[1] / "simulations" / "dbr_mta"
+sys.path.insert(0, str(DBR_PATH))
+
+from rlsim.environment import Environment, load_config  # noqa: E402
+from scheduler import DBR_MTA  # noqa: E402
+from stores import DBR_stores  # noqa: E402
+
+
+def build_env(
+    max_candidates: int,
+    aggregate_processing: bool = False,
+    training: bool = False,
+    agent_release: bool = False,
+) -> Environment:
+    return Environment(
+        run_until=10**9,
+        resources_cfg=load_config(DBR_PATH / "config" / "resources.yaml"),
+        products_cfg=load_config(DBR_PATH / "config" / "products.yaml"),
+        log_interval=48,
+        training=training,
+        stores=DBR_stores,
+        scheduler=DBR_MTA,
+        scheduler_kwargs={
+            "schedule_interval": 72,
+            "constraint_buffer_size": float("inf"),
+            "ccr_release_limit": float("inf"),
+        },
+        outbound_kwargs={"delivery_mode": "instantly"},
+        production_kwargs={"aggregate_processing": aggregate_processing},
+        agent_dispatching=True,
+        agent_release=agent_release,
+        max_candidates=max_candidates,
+        fast_reset=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=50000)
+    parser.add_argument("--max-candidates", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aggregate-processing", action="store_true")
+    parser.add_argument("--agent-release", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    env = build_env(
+        args.max_candidates,
+        args.aggregate_processing,
+        agent_release=args.agent_release,
+    )
+    obs, info = env.reset(seed=args.seed)
+
+    start = perf_counter()
+    for _ in range(args.steps):
+        obs, reward, terminated, truncated, info = env.step(
+            rng.randrange(args.max_candidates)
+        )
+        if terminated or truncated:
+            obs, info = env.reset()
+    elapsed = perf_counter() - start
+
+    print(f"{'steps':>10} {'seconds':>10} {'steps/s':>10} {'sim time':>10}")
+    print(
+        f"{args.steps:>10} {elapsed:>10.3f} {args.steps / elapsed:>10.0f} "
+        f"{env.env.now:>10.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
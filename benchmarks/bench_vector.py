@@ -0,0 +1,61 @@
+"""Step throughput of VectorEnvironment workers and in-process batches.
+
+Usage: python benchmarks/bench_vector.py [--envs 1 4 16] [--mode batch]
+"""
+
+import argparse
+import sys
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_step import build_env  # noqa: E402
+from rlsim.vector import BatchEnvironment, VectorEnvironment  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--envs", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--max-candidates", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--mode", choices=["subprocess", "batch", "both"], default="both"
+    )
+    parser.add_argument("--context", default=None, help="fork, spawn, forkserver")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    env_fn = partial(build_env, args.max_candidates)
+
+    modes = ["subprocess", "batch"] if args.mode == "both" else [args.mode]
+
+    print(f"{'mode':>10} {'envs':>6} {'steps':>10} {'seconds':>10} {'steps/s':>10}")
+    for mode in modes:
+        for num_envs in args.envs:
+            if mode == "batch":
+                venv = BatchEnvironment(env_fn, num_envs, seed=args.seed)
+            else:
+                venv = VectorEnvironment(
+                    env_fn, num_envs, seed=args.seed, context=args.context
+                )
+            with venv:
+                venv.reset()
+                start = perf_counter()
+                for _ in range(args.steps):
+                    venv.step(rng.integers(0, args.max_candidates, num_envs))
+                elapsed = perf_counter() - start
+
+            steps = args.steps * num_envs
+            print(
+                f"{mode:>10} {num_envs:>6} {steps:>10} {elapsed:>10.3f} "
+                f"{steps / elapsed:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Check that a long training episode runs in constant memory.
+
+The DBR plant runs in training mode with random dispatching decisions, and
+the traced Python memory is read after every window of `--steps` decisions.
+Queued orders make it fluctuate, so the highest reading of the second half
+of the windows is compared with the highest of the first half. Sampler
+prefetch blocks are excluded, they are capped at `block_size` draws per
+sampler and refill in cycles longer than a window. Exits with status 1 when
+memory grew by more than `--tolerance` KiB.
+
+Usage: python benchmarks/check_training_memory.py [--steps 20000] [--windows 6]
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_step import build_env  # noqa: E402
+from rlsim.engine import utils  # noqa: E402
+
+
+def traced_memory() -> int:
+    """Traced bytes, without the sampler prefetch blocks."""
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, utils.__file__)]
+    )
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--windows", type=int, default=6)
+    parser.add_argument("--tolerance", type=float, default=1024)
+    parser.add_argument("--max-candidates", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-training", action="store_true", help="Log metrics, for comparison"
+    )
+    args = parser.parse_args()
+    if args.windows < 2:
+        parser.error("--windows must be at least 2")
+
+    rng = random.Random(args.seed)
+    env = build_env(args.max_candidates, training=not args.no_training)
+    env.reset(seed=args.seed)
+
+    tracemalloc.start()
+    print(f"{'window':>10} {'sim time':>10} {'KiB':>10}")
+    memory = []
+    for window in range(args.windows):
+        for _ in range(args.steps):
+            obs, reward, terminated, truncated, info = env.step(
+                rng.randrange(args.max_candidates)
+            )
+            if terminated or truncated:
+                raise RuntimeError("Episode ended, increase run_until")
+        memory.append(traced_memory())
+        print(f"{window:>10} {env.env.now:>10.0f} {memory[-1] / 1024:>10.1f}")
+    tracemalloc.stop()
+
+    half = len(memory) // 2
+    growth = (max(memory[half:]) - max(memory[:half])) / 1024
+    print(f"growth of the peak between halves: {growth:.1f} KiB")
+    if growth > args.tolerance:
+        print(f"FAILED, more than {args.tolerance:.0f} KiB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
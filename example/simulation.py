@@ -16,7 +16,10 @@ def parse_args():
         "--monitor-interval", type=int, default=50000, help="Monitor sampling interval"
     )
     parser.add_argument(
-        "--log-interval", type=int, default=48, help="Log sampling interval"
+        "--log-interval",
+        type=int,
+        default=0,
+        help="Sampled WIP/FG log interval, 0 disables it",
     )
     parser.add_argument(
         "--warmup",
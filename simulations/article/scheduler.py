@@ -20,13 +20,12 @@ class ArticleScheduler(Scheduler):
             product = demandOrder.product
             quantity = demandOrder.quantity
 
-            ccr_processing_time = sum(
-                [
-                    process["processing_time"]["params"][0]
-                    for process in self.stores.processes_value_list[product]
-                    if process["resource"] == self.stores.contraint_resource
-                ]
-            )
+            plant = self.stores.plant
+            product_id = plant.product_ids[product]
+            ccr_id = plant.resource_ids[self.stores.contraint_resource]
+            ccr_processing_time = plant.processing_mean[
+                product_id, plant.next_resource[product_id] == ccr_id
+            ].sum()
 
             if ccr_processing_time > 0:
                 # schedule = (
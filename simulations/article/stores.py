@@ -24,7 +24,7 @@ class DBR_stores(Stores):
 
         self.contraint_resource, self.utilization_df = self.define_constraint()
 
-        self.update_constraint_buffer(self.contraint_resource)
+        self.subscribe("order_finish", self.update_constraint_buffer)
 
     def _create_constraint_buffer(self, cb_start):
         # Constraint buffers
@@ -56,11 +56,13 @@ class DBR_stores(Stores):
             mean_arrival_rate = product_demand.get("freq").get("params")[0]
             quantity = product_demand.get("quantity").get("params")[0]
 
-            for process in self.processes_value_list[product]:
-                mean_processing_time = process["processing_time"]["params"][0]
-                resource = process["resource"]
-
-                df.loc[product, resource] += mean_processing_time
+            product_id = self.plant.product_ids[product]
+            steps = self.plant.n_steps[product_id]
+            for resource_id, mean_processing_time in zip(
+                self.plant.next_resource[product_id, :steps],
+                self.plant.processing_mean[product_id, :steps].astype(np.float32),
+            ):
+                df.iloc[product_id, resource_id] += mean_processing_time
 
             df.loc[product, :] = df.loc[product, :] * (1 / mean_arrival_rate) * quantity
 
@@ -69,21 +71,14 @@ class DBR_stores(Stores):
 
         return constraint_resource, utilization_df
 
-    def update_constraint_buffer(self, constraint):
-        def _update_buffer():
-            while True:
-                productionOrder: ProductionOrder = yield self.resource_finished[
-                    constraint
-                ].get()
-                product = productionOrder.product
-                actual_process = productionOrder.process_finished - 1
-                product_process = self.processes_value_list[product][actual_process]
-                product_processing_time = product_process["processing_time"]["params"][
-                    0
-                ]
-                self.constraint_buffer_level -= product_processing_time
-
-        self.env.process(_update_buffer())
+    def update_constraint_buffer(self, resource, productionOrder: ProductionOrder):
+        if resource != self.contraint_resource:
+            return
+        actual_process = productionOrder.process_finished - 1
+        product_processing_time = self.plant.processing_mean[
+            productionOrder.product_id, actual_process
+        ]
+        self.constraint_buffer_level -= product_processing_time
 
     def calculate_shipping_buffer(self, product):
         self.shipping_buffer_level[product] = (
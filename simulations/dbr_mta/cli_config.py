@@ -10,12 +10,32 @@ def add_general_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser
         "--run-until", type=int, default=200001, help="Simulation end time"
     )
     general.add_argument("--seed", type=int, default=None, help="Random seed")
+    general.add_argument(
+        "--replication",
+        type=int,
+        default=0,
+        help="Replication index, selects independent random streams",
+    )
     general.add_argument("--sim-path", type=Path, default=None, help="Simulation path")
     general.add_argument(
         "--warmup", type=int, default=100000, help="Warmup for start logging results"
     )
     general.add_argument(
-        "--log-interval", type=int, default=48, help="Interval between vars log"
+        "--log-interval",
+        type=int,
+        default=0,
+        help="Interval between sampled WIP/FG logs, 0 disables them",
+    )
+    general.add_argument(
+        "--log-format",
+        choices=["csv", "npz", "parquet"],
+        default="csv",
+        help="File format of the saved logs, parquet requires pyarrow",
+    )
+    general.add_argument(
+        "--order-ledger",
+        action="store_true",
+        help="Save a row per order and operation with all their timestamps",
     )
     return parser
 
@@ -50,6 +70,22 @@ def add_scheduling_args(parser: argparse.ArgumentParser) -> argparse.ArgumentPar
         default=float("inf"),
         help="Limit to release orders",
     )
+    scheduling.add_argument(
+        "--aggregate-processing",
+        action="store_true",
+        help="Draw the whole order processing time in a single event",
+    )
+    scheduling.add_argument(
+        "--direct-routing",
+        action="store_true",
+        help="Move finished operations straight to the next queue",
+    )
+    scheduling.add_argument(
+        "--kernel",
+        choices=("simpy", "light"),
+        default="simpy",
+        help="Event loop running the simulation",
+    )
     return parser
 
 
@@ -83,6 +119,47 @@ def add_experiment_args(parser: argparse.ArgumentParser) -> argparse.ArgumentPar
         default=None,
         help="Folder path to save experiment results",
     )
+    experiment.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes running replications in parallel",
+    )
+    experiment.add_argument(
+        "--fork-warmup",
+        action="store_true",
+        help="Run the warm-up once and branch every run from its final state",
+    )
+    return parser
+
+
+def add_checkpoint_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Add checkpoint arguments to parser."""
+    checkpoint = parser.add_argument_group("Checkpoints")
+    checkpoint.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=None,
+        help="Simulated hours between checkpoints",
+    )
+    checkpoint.add_argument(
+        "--checkpoint-wall-interval",
+        type=float,
+        default=None,
+        help="Wall clock seconds between checkpoints",
+    )
+    checkpoint.add_argument(
+        "--checkpoint-path",
+        type=Path,
+        default=None,
+        help="Checkpoint file of a single simulation, defaults to checkpoint.pkl "
+        "in the simulation path, experiments keep one in every run folder",
+    )
+    checkpoint.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the checkpoint if it exists",
+    )
     return parser
 
 
@@ -97,6 +174,7 @@ def create_simulation_parser() -> argparse.ArgumentParser:
     parser = add_monitoring_args(parser)
     parser = add_scheduling_args(parser)
     parser = add_config_args(parser)
+    parser = add_checkpoint_args(parser)
 
     return parser
 
@@ -112,6 +190,7 @@ def create_experiment_parser() -> argparse.ArgumentParser:
     parser = add_monitoring_args(parser)
     parser = add_scheduling_args(parser)
     parser = add_config_args(parser)
+    parser = add_checkpoint_args(parser)
     parser = add_experiment_args(parser)
 
     return parser
@@ -126,7 +205,27 @@ def extract_simulation_args(args: argparse.Namespace) -> Dict[str, Any]:
         "monitor_warmup": args.monitor_warmup,
         "warmup": args.warmup,
         "seed": args.seed,
+        "replication": args.replication,
         "schedule_interval": args.schedule_interval,
         "constraint_buffer_size": args.cb_size,
         "ccr_release_limit": args.ccr_release_limit,
+        "aggregate_processing": args.aggregate_processing,
+        "direct_routing": args.direct_routing,
+        "kernel": args.kernel,
+        "order_ledger": args.order_ledger,
+    }
+
+
+def extract_checkpoint_args(
+    args: argparse.Namespace, default_path: Path = None
+) -> Dict[str, Any]:
+    """Extract `run_simulation` checkpoint arguments from parsed args."""
+    enabled = args.checkpoint_interval or args.checkpoint_wall_interval
+    if not (enabled or args.resume):
+        return {}
+    return {
+        "checkpoint_path": args.checkpoint_path or default_path,
+        "checkpoint_interval": args.checkpoint_interval,
+        "checkpoint_wall_interval": args.checkpoint_wall_interval,
+        "resume": args.resume,
     }
@@ -1,16 +1,40 @@
-import random
+import os
+import signal
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Manager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
 
+import numpy as np
 import pandas as pd
 import yaml
 
-from cli_config import create_experiment_parser, extract_simulation_args
+from cli_config import (
+    create_experiment_parser,
+    extract_checkpoint_args,
+    extract_simulation_args,
+)
 from rlsim.environment import load_config
 from simulation import SimulationDBR
 
+# Runner of the current worker process, set once by `_init_worker`
+_worker_runner = None
+
+
+def _init_worker(runner: "ExperimentRunner", pids) -> None:
+    """Keep the runner, with its warm-up snapshot, once per worker."""
+    global _worker_runner
+    # Workers ignore Ctrl+C, the parent decides how to stop them
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pids.append(os.getpid())
+    _worker_runner = runner
+
+
+def _run_in_worker(run_id: int, run_args: Dict[str, Any]) -> Dict[str, Any]:
+    return _worker_runner._run_single_simulation(run_id, run_args)
+
 
 class ExperimentRunner:
     """Runner for multiple DBR simulation experiments."""
@@ -23,20 +47,39 @@ class ExperimentRunner:
         number_of_runs: int,
         save_folder_path: Path,
         sim_path: Path = None,
+        workers: int = 1,
+        max_in_flight: int = None,
+        log_format: str = "csv",
+        fork_warmup: bool = False,
+        checkpoint_args: Dict[str, Any] = None,
     ):
         self.resources_cfg = resources_cfg
         self.products_cfg = products_cfg
-        self.simulation_args = simulation_args
+        self.simulation_args = simulation_args.copy()
         self.number_of_runs = number_of_runs
         self.save_folder_path = Path(save_folder_path)
         self.sim_path = sim_path or Path.cwd()
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.log_format = log_format
+        self.fork_warmup = fork_warmup
+        self.checkpoint_args = checkpoint_args or {}
 
         # Create save directory
         self.save_folder_path.mkdir(parents=True, exist_ok=True)
 
+        # One root seed for the whole experiment, replications get their own
+        # independent streams from it
+        if self.simulation_args.get("seed") is None:
+            self.simulation_args["seed"] = np.random.SeedSequence().entropy
+
         # Store experiment results
         self.results = []
 
+        # Post-warmup snapshot the runs branch from with fork_warmup
+        self.warmup_snapshot = None
+        self.warmup_ancestor = None
+
     def run_experiment(self) -> List[Dict[str, Any]]:
         """Run multiple simulation experiments."""
         print(f"Starting experiment with {self.number_of_runs} runs")
@@ -44,22 +87,17 @@ class ExperimentRunner:
 
         start_time = time.time()
 
-        for run_id in range(self.number_of_runs):
-            print(f"\n--- Running simulation - {run_id + 1}/{self.number_of_runs} ---")
-
-            # Set unique seed for each run if base seed is provided
-            run_args = self.simulation_args.copy()
-            if run_args.get("seed") is not None:
-                run_args["seed"] = run_args["seed"] + run_id
+        try:
+            if self.fork_warmup:
+                self._run_warmup()
+            if self.workers > 1:
+                self._run_parallel()
             else:
-                # Generate random seed for reproducibility
-                run_args["seed"] = random.randint(0, 999999)
-
-            # Run single simulation
-            result = self._run_single_simulation(run_id, run_args)
-            self.results.append(result)
-
-            print(f"Run {run_id + 1} completed in {result['elapsed_time']:.4f} seconds")
+                self._run_serial()
+        except KeyboardInterrupt:
+            # Keep whatever already finished before propagating
+            self._save_experiment_summary(time.time() - start_time)
+            raise
 
         total_time = time.time() - start_time
         print(f"\nExperiment completed in {total_time:.4f} seconds")
@@ -69,33 +107,166 @@ class ExperimentRunner:
 
         return self.results
 
+    def _run_args(self, run_id: int) -> Dict[str, Any]:
+        """Arguments of a run, depending only on its run id."""
+        # Same root seed, independent streams per replication
+        run_args = self.simulation_args.copy()
+        # The shared warm-up uses the base replication, branches the next ones
+        offset = 1 if self.fork_warmup else 0
+        run_args["replication"] = run_args.get("replication", 0) + run_id + offset
+        return run_args
+
+    def _run_warmup(self):
+        """Run the warm-up once and keep a snapshot of its final state.
+
+        Every run restores the snapshot and continues on the random streams
+        of its own replication, so runs share the warm-up history and only
+        differ after it.
+        """
+        replication = self.simulation_args.get("replication", 0)
+        warmup = self.simulation_args.get("warmup", 0)
+        print(f"\n--- Running shared warm-up until {warmup} ---")
+
+        start_time = time.time()
+        sim = SimulationDBR(
+            resources_cfg=self.resources_cfg,
+            products_cfg=self.products_cfg,
+            **self.simulation_args,
+        )
+        sim.sim.env.run(until=warmup)
+        self.warmup_snapshot = sim.sim.snapshot()
+        elapsed_time = time.time() - start_time
+
+        self.warmup_ancestor = {
+            "name": f"warmup_{replication:03d}",
+            "seed": self.simulation_args["seed"],
+            "replication": replication,
+            "fork_time": self.warmup_snapshot.time,
+            "elapsed_time": elapsed_time,
+            "runs": list(range(self.number_of_runs)),
+        }
+        print(f"Warm-up completed in {elapsed_time:.4f} seconds")
+
+    def _run_serial(self):
+        for run_id in range(self.number_of_runs):
+            print(f"\n--- Running simulation - {run_id + 1}/{self.number_of_runs} ---")
+
+            # Run single simulation
+            result = self._run_single_simulation(run_id, self._run_args(run_id))
+            self._add_result(result)
+
+    def _run_parallel(self):
+        """Run simulations in a process pool, merging results as they finish."""
+        print(f"Running with {self.workers} workers")
+        max_in_flight = self.max_in_flight or 2 * self.workers
+        pending_runs = iter(range(self.number_of_runs))
+        in_flight = set()
+
+        with Manager() as manager:
+            # Worker pids, to stop runs already handed to them
+            pids = manager.list()
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self, pids),
+            )
+            try:
+                while True:
+                    # Keep a bounded number of submitted tasks
+                    for run_id in pending_runs:
+                        in_flight.add(
+                            executor.submit(
+                                _run_in_worker, run_id, self._run_args(run_id)
+                            )
+                        )
+                        if len(in_flight) >= max_in_flight:
+                            break
+
+                    if not in_flight:
+                        break
+
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._add_result(future.result())
+
+            except KeyboardInterrupt:
+                print("\nInterrupted, stopping workers")
+                # Runs already handed to workers cannot be cancelled
+                executor.shutdown(wait=False, cancel_futures=True)
+                for pid in list(pids):
+                    try:
+                        os.kill(pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                raise
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+
+    def _add_result(self, result: Dict[str, Any]):
+        """Merge a finished run into the experiment results."""
+        self.results.append(result)
+        self.results.sort(key=lambda r: r["run_id"])
+
+        # Stream results to disk so interrupted experiments keep finished runs
+        first_result = len(self.results) == 1
+        pd.DataFrame([result]).to_csv(
+            self.save_folder_path / "experiment_results.csv",
+            mode="w" if first_result else "a",
+            header=first_result,
+            index=False,
+        )
+
+        print(
+            f"Run {result['run_id'] + 1} completed in "
+            f"{result['elapsed_time']:.4f} seconds "
+            f"({len(self.results)}/{self.number_of_runs})"
+        )
+
     def _run_single_simulation(
         self, run_id: int, run_args: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Run a single simulation and save results."""
+        """Run a single simulation and save results.
+
+        With `fork_warmup` the run branches from the shared warm-up snapshot.
+        """
         # Create simulation
         sim = SimulationDBR(
             resources_cfg=self.resources_cfg, products_cfg=self.products_cfg, **run_args
         )
-
-        # Run simulation
-        elapsed_time = sim.run_simulation()
+        if self.warmup_snapshot is not None:
+            sim.sim.restore(self.warmup_snapshot)
+            sim.sim.reseed(run_args["replication"])
 
         # Create run-specific folder
         run_folder = self.save_folder_path / f"run_{run_id:03d}"
         run_folder.mkdir(exist_ok=True)
 
+        # Run simulation, checkpointing into the run folder
+        checkpoint_args = self.checkpoint_args.copy()
+        if checkpoint_args:
+            checkpoint_args["checkpoint_path"] = run_folder / "checkpoint.pkl"
+        elapsed_time = sim.run_simulation(**checkpoint_args)
+
         # Save logs and parameters
-        sim.save_logs(run_folder)
+        sim.save_logs(run_folder, self.log_format)
         sim.save_params(run_folder)
 
         # Save run-specific info
+        levels = sim.sim.monitor.measure_levels()
         run_info = {
             "run_id": run_id,
             "seed": run_args["seed"],
             "elapsed_time": elapsed_time,
             "simulation_end_time": sim.sim.env.now,
+            # Time-weighted levels summed over products, see levels.csv
+            "wip_mean": float(levels["wip_mean"].sum()),
+            "fg_mean": float(levels["fg_mean"].sum()),
             "run_folder": str(run_folder),
+            "warmup_ancestor": (
+                self.warmup_ancestor["name"] if self.warmup_ancestor else None
+            ),
             **run_args,
         }
 
@@ -107,16 +278,24 @@ class ExperimentRunner:
 
     def _save_experiment_summary(self, total_time: float):
         """Save experiment summary and aggregated results."""
+        if not self.results:
+            return
+
         # Create summary
         summary = {
             "experiment_info": {
                 "number_of_runs": self.number_of_runs,
+                "completed_runs": len(self.results),
+                "workers": self.workers,
                 "total_experiment_time": total_time,
                 "average_run_time": sum(r["elapsed_time"] for r in self.results)
                 / len(self.results),
                 "save_folder_path": str(self.save_folder_path),
                 "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             },
+            "warmup_ancestors": (
+                [self.warmup_ancestor] if self.warmup_ancestor else []
+            ),
             "simulation_parameters": self.simulation_args,
             "runs_summary": self.results,
         }
@@ -184,6 +363,10 @@ def main():
             number_of_runs=args.number_of_runs,
             save_folder_path=save_folder_path,
             sim_path=sim_path,
+            workers=args.workers,
+            log_format=args.log_format,
+            fork_warmup=args.fork_warmup,
+            checkpoint_args=extract_checkpoint_args(args),
         )
 
         experiment.run_experiment()
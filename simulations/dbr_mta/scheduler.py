@@ -1,11 +1,15 @@
 from typing import Tuple, List
 
+import numpy as np
+
 from rlsim.engine.control import DemandOrder, ProductionOrder
 from rlsim.engine.scheduler import Scheduler
 from stores import DBR_stores
 
 
 class DBR_MTA(Scheduler):
+    release_decisions = True
+
     def __init__(
         self,
         stores: DBR_stores,
@@ -14,98 +18,166 @@ class DBR_MTA(Scheduler):
         ccr_release_limit,
         **kwargs,
     ):
-        super().__init__(stores, run_scheduler=False)
+        super().__init__(
+            stores,
+            run_scheduler=False,
+            agent_release=kwargs.get("agent_release", False),
+        )
         self.stores = kwargs.get("stores", stores)
         self.stores.constraint_buffer = kwargs.get(
             "constraint_buffer_size", constraint_buffer_size
         )
         self.schedule_interval = kwargs.get("schedule_interval", schedule_interval)
         self.ccr_release_limit = kwargs.get("ccr_release_limit", ccr_release_limit)
+        # Orders of the release tick waiting for the agent
+        self.release_candidates = None
 
         self.run_scheduler()
-        self.env.process(self._process_demandOders())
+        self.stores.start_process(self, "_process_demandOders")
+
+    def reset(self):
+        self.env = self.stores.env
+        self.release_candidates = None
+        self.run_scheduler()
+        self.stores.start_process(self, "_process_demandOders")
+
+    def get_state(self) -> dict:
+        return {"release_candidates": self.release_candidates}
+
+    def set_state(self, state: dict) -> None:
+        super().set_state(state)
+        self.release_candidates = state["release_candidates"]
 
     def run_scheduler(self):
-        self.env.process(self.scheduler(self.schedule_interval))
+        self.stores.start_process(self, "scheduler", self.schedule_interval)
 
-    def scheduler(self, interval):
+    def scheduler(self, interval, wake: float = None):
         ccr_setup_time_params = self.stores.resources[
             self.stores.contraint_resource
         ].get("setup", {"params": None})
         ccr_setup_time = ccr_setup_time_params.get("params", [0])[0]
 
+        # Constraint processing time per product id, fixed by the routings
+        plant = self.stores.plant
+        ccr_id = plant.resource_ids[self.stores.contraint_resource]
+        ccr_processing_times = np.where(
+            plant.next_resource == ccr_id, plant.processing_mean, 0.0
+        ).sum(axis=1)
+
+        if wake is not None:
+            yield self.stores.timeout(interval, wake)
+
         while True:
-            orders: List[Tuple[ProductionOrder, float, float]] = []
-            for product in self.stores.products.keys():
-
-                ccr_processing_time = sum(
-                    [
-                        process["processing_time"]["params"][0]
-                        for process in self.stores.processes_value_list[product]
-                        if process["resource"] == self.stores.contraint_resource
-                    ]
-                )
+            if self.agent_release:
+                yield from self._release_by_agent(ccr_processing_times, ccr_setup_time)
+            else:
+                self._release_by_buffer(ccr_processing_times, ccr_setup_time)
+
+            yield self.env.timeout(interval)
 
-                replenishment, penetration = self.calculate_replenishment(product)
-                orders.append(
-                    (
-                        # Production order
-                        ProductionOrder(
-                            product=product,
-                            quantity=replenishment,
-                            priority=round(
-                                penetration / self.stores.shipping_buffer[product], 3
-                            ),
+    def _tick_orders(self, ccr_processing_times: np.ndarray) -> List[tuple]:
+        """(order, constraint time per unit, release priority) of every
+        product at a release tick, highest release priority first.
+        """
+        orders: List[Tuple[ProductionOrder, float, float]] = []
+        for product_id, product in enumerate(self.stores.plant.products):
+
+            replenishment, penetration = self.calculate_replenishment(product)
+            orders.append(
+                (
+                    # Production order
+                    ProductionOrder(
+                        product=product,
+                        quantity=replenishment,
+                        priority=round(
+                            penetration / self.stores.shipping_buffer[product], 3
                         ),
-                        # ccr processin time
-                        ccr_processing_time,
-                        # Release priority
-                        round(replenishment / self.stores.shipping_buffer[product], 3),
-                    )
+                        product_id=product_id,
+                    ),
+                    # ccr processin time
+                    ccr_processing_times[product_id],
+                    # Release priority
+                    round(replenishment / self.stores.shipping_buffer[product], 3),
                 )
+            )
 
-            # Ordenate by priority
-            orders = list(sorted(orders, key=lambda x: x[-1], reverse=True))
-
-            # Release orders based on priority
-            if self.stores.constraint_buffer_level < self.stores.constraint_buffer:
-                ccr_safe_load = (
-                    self.stores.constraint_buffer - self.stores.constraint_buffer_level
-                )
+        # Ordenate by priority
+        return list(sorted(orders, key=lambda x: x[-1], reverse=True))
 
-                ccr_released = 0
-                for productionOrder, ccr_time, _ in orders:
-                    product = productionOrder.product
-                    quantity = productionOrder.quantity
-                    release = False
-                    if ccr_time > 0:
-                        if ccr_safe_load > 0 and ccr_released < self.ccr_release_limit:
-                            ccr_time = (quantity * ccr_time) + ccr_setup_time
-                            productionOrder.schedule = self.env.now + ccr_time
-                            release = True
-                            ccr_released += 1
-                    else:
-                        ccr_time = 0
-                        productionOrder.schedule = self.env.now
+    def _release_by_buffer(
+        self, ccr_processing_times: np.ndarray, ccr_setup_time: float
+    ):
+        """Release the tick orders while the constraint buffer has room."""
+        orders = self._tick_orders(ccr_processing_times)
+
+        # Release orders based on priority
+        if self.stores.constraint_buffer_level < self.stores.constraint_buffer:
+            ccr_safe_load = (
+                self.stores.constraint_buffer - self.stores.constraint_buffer_level
+            )
+
+            ccr_released = 0
+            for productionOrder, ccr_time, _ in orders:
+                product = productionOrder.product
+                quantity = productionOrder.quantity
+                release = False
+                if ccr_time > 0:
+                    if ccr_safe_load > 0 and ccr_released < self.ccr_release_limit:
+                        ccr_time = (quantity * ccr_time) + ccr_setup_time
+                        productionOrder.schedule = self.env.now + ccr_time
                         release = True
+                        ccr_released += 1
+                else:
+                    ccr_time = 0
+                    productionOrder.schedule = self.env.now
+                    release = True
+
+                if quantity > 0 and release:
+                    self.stores.start_process(
+                        self, "process_order", productionOrder, ccr_time
+                    )
+                    ccr_safe_load -= ccr_time
 
-                    if quantity > 0 and release:
-                        self.env.process(self.process_order(productionOrder, ccr_time))
-                        ccr_safe_load -= ccr_time
-
-            yield self.env.timeout(interval)
+    def _release_by_agent(
+        self, ccr_processing_times: np.ndarray, ccr_setup_time: float
+    ):
+        """Let the agent decide the release tick: the action is the number of
+        candidate orders to release, by release priority. The constraint
+        buffer and the release limit are not applied.
+        """
+        if self.release_candidates is None:
+            self.release_candidates = [
+                order
+                for order, _, _ in self._tick_orders(ccr_processing_times)
+                if order.quantity > 0
+            ]
+        if self.release_candidates:
+            released = yield self.stores.decisions.request(
+                "release", "release", self.release_candidates
+            )
+            for productionOrder in released:
+                ccr_time = ccr_processing_times[productionOrder.product_id]
+                if ccr_time > 0:
+                    ccr_time = productionOrder.quantity * ccr_time + ccr_setup_time
+                productionOrder.schedule = self.env.now + ccr_time
+                self.stores.start_process(
+                    self, "process_order", productionOrder, ccr_time
+                )
+        self.release_candidates = None
 
-    def process_order(self, productionOrder: ProductionOrder, ccr_add: float):
+    def process_order(
+        self, productionOrder: ProductionOrder, ccr_add: float, wake: float = None
+    ):
         if (
             productionOrder.schedule is not None
             and productionOrder.schedule > self.env.now
         ):
             delay = productionOrder.schedule - self.env.now
-            yield self.env.timeout(delay)
+            yield self.stores.timeout(delay, wake)
 
         self.stores.constraint_buffer_level += ccr_add
         self.stores.production_orders[productionOrder.product] = productionOrder
-        self.env.process(self.release_order(productionOrder))
+        self.stores.start_process(self, "release_order", productionOrder)
 
     def calculate_replenishment(self, product):
         finished_goods = self.stores.finished_goods[product].level
@@ -2,13 +2,18 @@ from pathlib import Path
 from time import time
 from typing import List, Optional, Dict, Any, Callable
 
+import numpy as np
 import yaml
 from scheduler import DBR_MTA
 from stores import DBR_stores
 
 from rlsim.engine.control import ProductionOrder
 from rlsim.environment import Environment, load_config
-from cli_config import create_simulation_parser, extract_simulation_args
+from cli_config import (
+    create_simulation_parser,
+    extract_checkpoint_args,
+    extract_simulation_args,
+)
 
 
 class SimulationDBR:
@@ -20,13 +25,18 @@ class SimulationDBR:
         resources_cfg: Dict[str, Any],
         products_cfg: Dict[str, Any],
         monitor_interval: int = 50000,
-        log_interval: int = 48,
+        log_interval: int = 0,
         monitor_warmup: int = 0,
         warmup: int = 100000,
         seed: Optional[int] = None,
+        replication: int = 0,
         schedule_interval: int = 72,
         constraint_buffer_size: float = float("inf"),
         ccr_release_limit: float = float("inf"),
+        aggregate_processing: bool = False,
+        direct_routing: bool = False,
+        kernel: str = "simpy",
+        order_ledger: bool = False,
     ):
         self.sim = Environment(
             run_until=run_until,
@@ -37,7 +47,9 @@ class SimulationDBR:
             monitor_warmup=monitor_warmup,
             warmup=warmup,
             seed=seed,
+            replication=replication,
             stores=DBR_stores,
+            stores_kwargs={"order_ledger": order_ledger},
             scheduler=DBR_MTA,
             scheduler_kwargs={
                 "schedule_interval": schedule_interval,
@@ -45,19 +57,31 @@ class SimulationDBR:
                 "ccr_release_limit": ccr_release_limit,
             },
             outbound_kwargs={"delivery_mode": "instantly"},
-            production_kwargs={"order_selection_fn": self._create_order_selection_fn()},
+            production_kwargs={
+                "order_selection_fn": self._create_order_selection_fn(),
+                "aggregate_processing": aggregate_processing,
+                "direct_routing": direct_routing,
+            },
+            kernel=kernel,
         )
 
-    def run_simulation(self) -> float:
-        """Run the simulation and return elapsed time."""
+    def run_simulation(self, **checkpoint_args) -> float:
+        """Run the simulation and return elapsed time.
+
+        `checkpoint_args` are passed to `Environment.run_simulation`.
+        """
         start_time = time()
-        self.sim.run_simulation()
+        self.sim.run_simulation(**checkpoint_args)
         elapsed_time = time() - start_time
         print(f"Elapsed time: {elapsed_time:.4f} seconds")
         return elapsed_time
 
-    def save_logs(self, sim_path: Path):
-        """Save simulation logs to CSV files."""
+    def save_logs(self, sim_path: Path, log_format: str = "csv"):
+        """Save simulation logs as csv, npz or parquet files.
+
+        Products and resources are the long-format metric logs, levels the
+        time-weighted WIP and finished goods of `Monitor.measure_levels`.
+        """
         if not isinstance(sim_path, Path):
             sim_path = Path(sim_path)
 
@@ -65,11 +89,42 @@ class SimulationDBR:
         data_path.mkdir(parents=True, exist_ok=True)
 
         print(f"Saving logs to {data_path}")
-        df_products = self.sim.stores.log_products.to_dataframe()
-        df_products.to_csv(data_path / "products.csv", index=False)
-
-        df_resources = self.sim.stores.log_resources.to_dataframe()
-        df_resources.to_csv(data_path / "resources.csv", index=False)
+        logs = {
+            "products": self.sim.stores.log_products,
+            "resources": self.sim.stores.log_resources,
+        }
+        for name, log in logs.items():
+            match log_format:
+                case "csv":
+                    log.to_dataframe().to_csv(data_path / f"{name}.csv", index=False)
+                case "npz":
+                    log.to_npz(data_path / f"{name}.npz")
+                case "parquet":
+                    log.to_parquet(data_path / f"{name}.parquet")
+                case _:
+                    raise ValueError(f"Unknown log format {log_format}")
+
+        # Exact time-weighted WIP and finished goods, one row per product
+        levels = self.sim.monitor.measure_levels().rename_axis("product")
+        levels = levels.reset_index()
+        match log_format:
+            case "csv":
+                levels.to_csv(data_path / "levels.csv", index=False)
+            case "npz":
+                np.savez_compressed(
+                    data_path / "levels.npz",
+                    **{
+                        column: levels[column].to_numpy(
+                            dtype=str if column == "product" else None
+                        )
+                        for column in levels.columns
+                    },
+                )
+            case "parquet":
+                levels.to_parquet(data_path / "levels.parquet", index=False)
+
+        if self.sim.stores.ledger is not None:
+            self.sim.stores.ledger.save(data_path, log_format)
 
     def save_params(self, sim_path: Path):
         """Save simulation parameters."""
@@ -82,34 +137,25 @@ class SimulationDBR:
         print(f"Saving params to {data_path}")
         self.sim.save_parameters(data_path)
 
-    def _create_order_selection_fn(self) -> Callable:
+    @staticmethod
+    def _create_order_selection_fn() -> Callable:
         """Create the DBR order selection function."""
 
         def order_selection(store: DBR_stores, resource) -> int:
             orders: List[ProductionOrder] = store.resource_input[resource].items
 
-            for id, production_order in enumerate(orders):
-                # Get all orders ahead in the system
-                ahead_orders: List[ProductionOrder] = []
-                for resource_ in store.resources.keys():
-                    ahead_orders.extend(store.resource_input[resource_].items)
-                    ahead_orders.extend(store.resource_output[resource_].items)
-                    ahead_orders.extend(store.resource_transport[resource_].items)
-                    ahead_orders.extend(store.resource_processing[resource_].items)
-
+            for production_order in orders:
                 product = production_order.product
-                released = production_order.released
 
-                # Calculate quantity of orders ahead for same product
-                ahead_quantity = [
-                    order.quantity
-                    for order in ahead_orders
-                    if order.released < released and order.product == product
-                ]
+                # Quantity of the same product released ahead of this order,
+                # O(log n) from the incremental WIP index
+                ahead_quantity = store.wip_index.quantity_ahead(
+                    product, production_order.released
+                )
 
                 # Calculate priority
-                orders[id].priority = (
-                    sum(ahead_quantity) + store.finished_goods[product].level
+                production_order.priority = (
+                    ahead_quantity + store.finished_goods[product].level
                 ) / store.shipping_buffer[product]
 
             # Return order with lowest priority
@@ -141,8 +187,8 @@ def main():
         resources_cfg=resources_cfg, products_cfg=products_cfg, **simulation_args
     )
 
-    sim.run_simulation()
-    sim.save_logs(sim_path)
+    sim.run_simulation(**extract_checkpoint_args(args, sim_path / "checkpoint.pkl"))
+    sim.save_logs(sim_path, args.log_format)
     sim.save_params(sim_path)
 
 
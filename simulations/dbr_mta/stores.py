@@ -14,9 +14,12 @@ class DBR_stores(Stores):
         resources: dict,
         products: dict,
         warmup: int = 0,
-        log_interval: int = 72,
+        log_interval: int = 0,
         training: bool = False,
         seed: int = None,
+        replication: int = 0,
+        dispatching_rule: str = "fifo",
+        order_ledger: bool = False,
         **kwargs,
     ):
         super().__init__(
@@ -27,6 +30,9 @@ class DBR_stores(Stores):
             log_interval=kwargs.get("log_interval", log_interval),
             training=kwargs.get("training", training),
             seed=kwargs.get("seed", seed),
+            replication=kwargs.get("replication", replication),
+            dispatching_rule=kwargs.get("dispatching_rule", dispatching_rule),
+            order_ledger=kwargs.get("order_ledger", order_ledger),
         )
 
         self._create_shipping_buffers()
@@ -36,7 +42,35 @@ class DBR_stores(Stores):
 
         self.contraint_resource, self.utilization_df = self.define_constraint()
 
-        self.update_constraint_buffer(self.contraint_resource)
+        setup_config = self.resources[self.contraint_resource].get(
+            "setup", {"params": None}
+        )
+        self.constraint_setup_time = setup_config.get("params", [0])[0]
+        self.subscribe("order_finish", self.update_constraint_buffer)
+
+    def reset(self, env: simpy.Environment, seed: int = None, replication: int = 0):
+        # The constraint resource only depends on the config, keep it
+        super().reset(env, seed=seed, replication=replication)
+
+        self._create_shipping_buffers()
+        self.constraint_buffer_level = 0
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state["shipping_buffer_level"] = self.shipping_buffer_level
+        state["production_orders"] = self.production_orders
+        state["constraint_buffer_level"] = self.constraint_buffer_level
+        return state
+
+    def set_state(self, env: simpy.Environment, state: dict) -> None:
+        super().set_state(env, state)
+        self.shipping_buffer = {
+            product: self.products[product].get("shipping_buffer", 0)
+            for product in self.products
+        }
+        self.shipping_buffer_level = state["shipping_buffer_level"]
+        self.production_orders = state["production_orders"]
+        self.constraint_buffer_level = state["constraint_buffer_level"]
 
     def _create_shipping_buffers(self):
         # Shipping_buffer
@@ -68,11 +102,13 @@ class DBR_stores(Stores):
             mean_arrival_rate = product_demand.get("freq").get("params")[0]
             quantity = product_demand.get("quantity").get("params")[0]
 
-            for process in self.processes_value_list[product]:
-                mean_processing_time = process["processing_time"]["params"][0]
-                resource = process["resource"]
-
-                df.loc[product, resource] += mean_processing_time
+            product_id = self.plant.product_ids[product]
+            steps = self.plant.n_steps[product_id]
+            for resource_id, mean_processing_time in zip(
+                self.plant.next_resource[product_id, :steps],
+                self.plant.processing_mean[product_id, :steps].astype(np.float32),
+            ):
+                df.iloc[product_id, resource_id] += mean_processing_time
 
             df.loc[product, :] = df.loc[product, :] * (1 / mean_arrival_rate) * quantity
 
@@ -81,27 +117,18 @@ class DBR_stores(Stores):
 
         return constraint_resource, utilization_df
 
-    def update_constraint_buffer(self, constraint):
-        setup_config = self.resources[constraint].get("setup", {"params": None})
-        setup_time = setup_config.get("params", [0])[0]
-
-        def _update_buffer():
-            while True:
-                productionOrder: ProductionOrder = yield self.resource_finished[
-                    constraint
-                ].get()
-                product = productionOrder.product
-                quantity = productionOrder.quantity
-                actual_process = productionOrder.process_finished - 1
-                product_process = self.processes_value_list[product][actual_process]
-                product_processing_time = product_process["processing_time"]["params"][
-                    0
-                ]
-                self.constraint_buffer_level -= (
-                    quantity * product_processing_time
-                ) + setup_time
-
-        self.env.process(_update_buffer())
+    def update_constraint_buffer(self, resource, productionOrder: ProductionOrder):
+        """Release the load of operations finished on the constraint."""
+        if resource != self.contraint_resource:
+            return
+        quantity = productionOrder.quantity
+        actual_process = productionOrder.process_finished - 1
+        product_processing_time = self.plant.processing_mean[
+            productionOrder.product_id, actual_process
+        ]
+        self.constraint_buffer_level -= (
+            quantity * product_processing_time
+        ) + self.constraint_setup_time
 
     def calculate_shipping_buffer(self, product):
         self.shipping_buffer_level[product] = (
@@ -1,9 +1,28 @@
+from bisect import bisect_left
+from collections import deque
+from itertools import count
 from dataclasses import dataclass, field, fields
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, ClassVar, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import simpy
 
+from rlsim.engine.kernel import primitive
+from rlsim.engine.ledger import OrderLedger
+from rlsim.engine.plant import PlantModel
+from rlsim.engine.queues import Inventory, OrderQueue
+from rlsim.engine.state import TimeoutAt
+from rlsim.engine.utils import RandomStreams
+
+HOOKS = ("order_start", "order_finish", "release", "delivery")
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 
 class Stores:
     def __init__(
@@ -12,9 +31,12 @@ class Stores:
         resources: dict,
         products: dict,
         warmup: int = 0,
-        log_interval: int = 72,
+        log_interval: int = 0,
         training: bool = False,
         seed: int = None,
+        replication: int = 0,
+        dispatching_rule: str = "fifo",
+        order_ledger: bool = False,
     ):
         self.env = env
         self.resources: Dict[str, dict] = resources
@@ -23,150 +45,822 @@ class Stores:
         self.log_interval = log_interval
         self.training = training
         self.seed = seed
+        self.replication = replication
+        self.streams = RandomStreams(seed=seed, replication=replication)
+        self.dispatching_rule = dispatching_rule
+
+        # Hook subscribers, kept across resets and restores
+        self.on_order_start: List[Callable] = []
+        self.on_order_finish: List[Callable] = []
+        self.on_release: List[Callable] = []
+        self.on_delivery: List[Callable] = []
 
         self._create_process_data()
+
+        # Training keeps fixed-size counters instead of the samples
+        series = MetricCounter if training else MetricSeries
+        self.log_products = ProductMetrics(self.products.keys(), series)
+        self.log_resources = ResourceMetrics(self.resources.keys(), series)
+
+        self.total_wip_log = series()
+
+        # Exact time-weighted levels, the logs above are periodic samples
+        self.wip_stats = {p: LevelStats(warmup) for p in self.products}
+        self.fg_stats = {p: LevelStats(warmup) for p in self.products}
+
+        # Row per order and operation, opt-in
+        self.ledger = OrderLedger(self) if order_ledger else None
+
+        self._create_state()
+        self._start_processes()
+
+    def _create_state(self) -> None:
         self._create_resources_stores()
         self._create_products_stores()
 
-        self.log_products = ProductMetrics(self.products.keys())
-        self.log_resources = ResourceMetrics(self.resources.keys())
+        self.wip_index = WipIndex(self.products.keys())
+        self.decisions = DecisionQueue(self.env)
+        self.live_processes: Dict[simpy.Process, tuple] = {}
+
+        # Order ids are unique per environment, not per process
+        self.production_order_ids = count(1)
+        self.demand_order_ids = count(1)
+
+    def _start_processes(self) -> None:
+        # Sampled WIP and finished goods logs are opt-in
+        if not self.training and self.log_interval > 0:
+            self.start_process(self, "_log_products")
+
+    def start_process(self, owner, method: str, *args, wake: float = None):
+        """Start `owner.method(*args)` as a process that snapshots can resume.
+
+        Live processes are kept with their owner, method and arguments.
+        Processes keep their progress in their owner, so a process started
+        again with the same arguments continues where it was, `wake` being
+        the time of the timeout it was waiting on.
+        """
+        if wake is None:
+            generator = getattr(owner, method)(*args)
+        else:
+            generator = getattr(owner, method)(*args, wake=wake)
+        process = self.env.process(generator)
+        self.live_processes[process] = (owner, method, args)
+        process.callbacks.append(self._process_finished)
+        return process
+
+    def subscribe(self, hook: str, callback: Callable) -> None:
+        """Call `callback` on every `hook` event, with the arguments:
+            order_start(resource, order): an operation starts on `resource`
+            order_finish(resource, order): an operation ends on `resource`
+            release(order): a production order is released
+            delivery(demand_order): a demand order is delivered
+
+        Callbacks run inside the simulation and cannot wait on events.
+        Hooks without subscribers cost nothing.
+        """
+        if hook not in HOOKS:
+            raise ValueError(f"Unknown hook {hook}, expected one of {HOOKS}")
+        getattr(self, f"on_{hook}").append(callback)
+
+    def unsubscribe(self, hook: str, callback: Callable) -> None:
+        getattr(self, f"on_{hook}").remove(callback)
+
+    def _process_finished(self, process: simpy.Process) -> None:
+        del self.live_processes[process]
+
+    def timeout(self, delay: float, wake: float = None) -> simpy.Event:
+        """Timeout after `delay`, or at `wake` when resuming a process."""
+        if wake is None:
+            return self.env.timeout(delay)
+        return TimeoutAt(self.env, wake)
+
+    def reset(self, env: simpy.Environment, seed: int = None, replication: int = 0):
+        """Start a new episode on `env`.
+
+        Process data parsed from the config and the metric arrays are kept,
+        stores, indexes and random streams are recreated.
+        """
+        self.env = env
+        self.seed = seed
+        self.replication = replication
+        self.streams = RandomStreams(seed=seed, replication=replication)
+
+        self.log_products.clear()
+        self.log_resources.clear()
+        self.total_wip_log.clear()
+        for stats in (*self.wip_stats.values(), *self.fg_stats.values()):
+            stats.clear()
+        if self.ledger is not None:
+            self.ledger.clear()
+
+        self._create_state()
+        self._start_processes()
+
+    def reseed(self, replication: int) -> None:
+        """Switch to the random streams of another replication."""
+        self.replication = replication
+        self.streams = self.streams.replication_streams(replication)
+
+    def metric_series(self):
+        """Every metric series, level accumulator and the order ledger, in a
+        fixed order.
+        """
+        for table in (self.log_products, self.log_resources):
+            for fi in fields(table):
+                yield from getattr(table, fi.name).values()
+        yield self.total_wip_log
+        yield from self.wip_stats.values()
+        yield from self.fg_stats.values()
+        if self.ledger is not None:
+            yield self.ledger
+
+    def get_state(self) -> dict:
+        """Picklable contents of the stores, metrics excluded."""
+        # Read the next ids without consuming them
+        production_id = next(self.production_order_ids)
+        demand_id = next(self.demand_order_ids)
+        self.production_order_ids = count(production_id)
+        self.demand_order_ids = count(demand_id)
+
+        def items(stores: Dict[str, simpy.Store]) -> Dict[str, list]:
+            return {key: list(store.items) for key, store in stores.items()}
+
+        return {
+            "streams": self.streams,
+            "resource_output": items(self.resource_output),
+            "resource_input": {
+                resource: queue.get_state()
+                for resource, queue in self.resource_input.items()
+            },
+            "processing": self.processing,
+            "resource_transport": items(self.resource_transport),
+            "finished_goods": {p: c.level for p, c in self.finished_goods.items()},
+            "wip": {p: c.level for p, c in self.wip.items()},
+            "inbound_demand_orders": list(self.inbound_demand_orders.items),
+            "outbound_demand_orders": items(self.outbound_demand_orders),
+            "wip_index": self.wip_index,
+            "production_order_ids": production_id,
+            "demand_order_ids": demand_id,
+        }
+
+    def set_state(self, env: simpy.Environment, state: dict) -> None:
+        """Recreate the stores on `env` from `get_state`, without processes."""
+        self.env = env
+        self._create_state()
+        self.streams = state["streams"]
+        self.replication = self.streams.replication
+
+        for name in (
+            "resource_output",
+            "resource_transport",
+            "outbound_demand_orders",
+        ):
+            for key, store in getattr(self, name).items():
+                store.items.extend(state[name][key])
+        for resource, queue in self.resource_input.items():
+            queue.set_state(state["resource_input"][resource])
+        self.inbound_demand_orders.items.extend(state["inbound_demand_orders"])
+        self.processing = state["processing"]
 
-        self.total_wip_log: List[Tuple[float, float]] = []
+        for product in self.products:
+            self.finished_goods[product].level = state["finished_goods"][product]
+            self.wip[product].level = state["wip"][product]
 
-        if not training:
-            self._register_log()
+        self.wip_index = state["wip_index"]
+        self.production_order_ids = count(state["production_order_ids"])
+        self.demand_order_ids = count(state["demand_order_ids"])
 
     def _create_process_data(self) -> None:
-        self.processes_name_list = {}
-        self.processes_value_list = {}
-        self.processes = {}
-
-        for product in self.products:
-            processes: dict = self.products[product].get("processes")
-            self.processes_name_list[product] = list(processes.keys())
-            self.processes_value_list[product] = list(processes.values())
+        self.plant = PlantModel.compile(self.products, self.resources)
+        # Process names and configs of each product, in routing order
+        self.processes_name_list: Dict[str, List[str]] = {
+            product: list(names)
+            for product, names in zip(self.plant.products, self.plant.process_names)
+        }
+        self.processes_value_list: Dict[str, List[dict]] = {
+            product: list(self.products[product]["processes"].values())
+            for product in self.plant.products
+        }
 
     def _create_resources_stores(self) -> None:
         self.resource_output: Dict[str, simpy.FilterStore] = {}
-        self.resource_input: Dict[str, simpy.FilterStore] = {}
-        self.resource_processing: Dict[str, simpy.Store] = {}
-        self.resource_finished: Dict[str, simpy.Store] = {}
+        self.resource_input: Dict[str, OrderQueue] = {}
+        # Order in process on each resource, None when idle
+        self.processing: Dict[str, Optional["ProductionOrder"]] = {}
         self.resource_transport: Dict[str, simpy.Store] = {}
+        FilterStore = primitive(self.env, "FilterStore")
+        Store = primitive(self.env, "Store")
 
         for resource in self.resources:
-            self.resource_output[resource] = simpy.FilterStore(self.env)
-            self.resource_input[resource] = simpy.FilterStore(self.env)
-            self.resource_processing[resource] = simpy.Store(self.env)
-            self.resource_transport[resource] = simpy.Store(self.env)
-            self.resource_finished[resource] = simpy.Store(self.env)
+            self.resource_output[resource] = FilterStore(self.env)
+            self.resource_input[resource] = OrderQueue(
+                self.env,
+                rule=self.resources[resource].get(
+                    "dispatching_rule", self.dispatching_rule
+                ),
+                plant=self.plant,
+            )
+            self.processing[resource] = None
+            self.resource_transport[resource] = Store(self.env)
+
+        # Same queues indexed by resource id, for routing on the plant tables
+        self.input_queues: List[OrderQueue] = [
+            self.resource_input[resource] for resource in self.plant.resources
+        ]
 
     def _create_products_stores(self) -> None:
 
         # Outbound Stores
-        self.finished_goods: Dict[str, simpy.Container] = {}
+        self.finished_goods: Dict[str, Inventory] = {}
 
         # Demand Orders stores
-        self.inbound_demand_orders = simpy.FilterStore(self.env)
+        Store = primitive(self.env, "Store")
+        self.inbound_demand_orders = primitive(self.env, "FilterStore")(self.env)
         self.outbound_demand_orders: Dict[str, simpy.Store] = {}
-        self.wip: Dict[str, simpy.Container] = {}
+        self.wip: Dict[str, Inventory] = {}
 
         for product in self.products:
-            self.finished_goods[product] = simpy.Container(self.env)
-            self.outbound_demand_orders[product] = simpy.Store(self.env)
-            self.wip[product] = simpy.Container(self.env)
+            self.finished_goods[product] = Inventory(
+                self.env, stats=(self.fg_stats[product],)
+            )
+            self.outbound_demand_orders[product] = Store(self.env)
+            self.wip[product] = Inventory(self.env, stats=(self.wip_stats[product],))
 
-    def _register_log(self) -> None:
-        def register_product_log():
-            yield self.env.timeout(self.warmup)
-            while True:
-                total_wip = 0
-                for product in self.products.keys():
+    def _log_products(self, wake: float = None):
+        yield self.timeout(self.warmup, wake)
+        while True:
+            total_wip = 0
+            for product in self.products.keys():
 
-                    self.log_products.fg_log[product].append(
-                        (self.env.now, self.finished_goods[product].level)
-                    )
+                self.log_products.fg_log[product].append(
+                    self.env.now, self.finished_goods[product].level
+                )
 
-                    wip = self.wip[product].level
-                    self.log_products.wip_log[product].append((self.env.now, wip))
-                    total_wip += wip
+                wip = self.wip[product].level
+                self.log_products.wip_log[product].append(self.env.now, wip)
+                total_wip += wip
 
-                self.total_wip_log.append((self.env.now, total_wip))
+            self.total_wip_log.append(self.env.now, total_wip)
 
-                yield self.env.timeout(self.log_interval)
+            yield self.env.timeout(self.log_interval)
 
-        self.env.process(register_product_log())
 
+class WipIndex:
+    """Released WIP quantities per product, ordered by release time.
 
-@dataclass
-class ProductMetrics:
-    delivered_ontime: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    delivered_late: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    lost_sales: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    flow_time: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    lead_time: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    tardiness: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    earliness: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    wip_log: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    fg_log: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    released: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
+    Orders are added on release and removed when they finish, keeping a
+    Fenwick tree of quantities per product. The quantity released strictly
+    before a given time is then answered in O(log n).
+    """
 
     def __init__(self, products):
-        self.delivered_ontime = {p: [] for p in products}
-        self.delivered_late = {p: [] for p in products}
-        self.lost_sales = {p: [] for p in products}
-        self.flow_time = {p: [] for p in products}
-        self.lead_time = {p: [] for p in products}
-        self.tardiness = {p: [] for p in products}
-        self.earliness = {p: [] for p in products}
-        self.wip_log = {p: [] for p in products}
-        self.fg_log = {p: [] for p in products}
-        self.released = {p: [] for p in products}
+        self._times: Dict[str, List[float]] = {p: [] for p in products}
+        self._quantities: Dict[str, List[float]] = {p: [] for p in products}
+        self._tree: Dict[str, List[float]] = {p: [0.0] for p in products}
+        self._live: Dict[str, int] = {p: 0 for p in products}
+        self._position: Dict[int, Tuple[str, int]] = {}
+
+    @staticmethod
+    def _prefix(tree: List[float], i: int) -> float:
+        total = 0.0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    @staticmethod
+    def _update(tree: List[float], i: int, delta: float) -> None:
+        size = len(tree)
+        while i < size:
+            tree[i] += delta
+            i += i & -i
+
+    def add(self, order: "ProductionOrder") -> None:
+        product = order.product
+        times = self._times[product]
+        tree = self._tree[product]
+
+        times.append(order.released)
+        self._quantities[product].append(order.quantity)
+        i = len(times)
+        # Node i covers (i - lowbit(i), i]
+        tree.append(
+            order.quantity
+            + self._prefix(tree, i - 1)
+            - self._prefix(tree, i - (i & -i))
+        )
+        self._position[order.id] = (product, i)
+        self._live[product] += 1
+
+    def remove(self, order: "ProductionOrder") -> None:
+        product, i = self._position.pop(order.id)
+        self._update(self._tree[product], i, -self._quantities[product][i - 1])
+        self._quantities[product][i - 1] = 0
+        self._live[product] -= 1
+
+        # Compact once finished orders dominate the index
+        if len(self._times[product]) > 2 * self._live[product] + 1024:
+            self._compact(product)
+
+    def _compact(self, product: str) -> None:
+        live = [
+            (order_id, i)
+            for order_id, (order_product, i) in self._position.items()
+            if order_product == product
+        ]
+        live.sort(key=lambda item: item[1])
+        times = [self._times[product][i - 1] for _, i in live]
+        quantities = [self._quantities[product][i - 1] for _, i in live]
 
-    def to_dataframe(self) -> pd.DataFrame:
-        df = pd.DataFrame(
-            columns=["time", "value", "variable", "product"],
+        tree = [0.0] + quantities
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+
+        self._times[product] = times
+        self._quantities[product] = quantities
+        self._tree[product] = tree
+        for new_i, (order_id, _) in enumerate(live, start=1):
+            self._position[order_id] = (product, new_i)
+
+    def quantity_ahead(self, product: str, released: float) -> float:
+        """WIP quantity of `product` released strictly before `released`."""
+        i = bisect_left(self._times[product], released)
+        return self._prefix(self._tree[product], i)
+
+    def quantity(self, product: str) -> float:
+        return self._prefix(self._tree[product], len(self._times[product]))
+
+
+class Decision:
+    """Pending agent decision, succeeded with the selected candidates.
+
+    `source` is a store whose `items` are the candidates, or the list of
+    candidates itself.
+    """
+
+    __slots__ = ("kind", "key", "source", "event")
+
+    def __init__(self, kind: str, key: str, source, event: simpy.Event):
+        self.kind = kind
+        self.key = key
+        self.source = source
+        self.event = event
+
+    @property
+    def candidates(self) -> list:
+        source = self.source
+        return source if isinstance(source, list) else source.items
+
+
+class DecisionQueue:
+    """Decisions requested by engine processes, answered by the agent.
+
+    A process yields the event returned by `request` and resumes with the
+    answer chosen in `Environment.step`: the order to dispatch for
+    "dispatch" decisions, the orders to release for "release" decisions.
+    Candidates are read when the decision is answered, so orders arriving
+    in a store while the decision is pending are included.
+    """
+
+    def __init__(self, env: simpy.Environment):
+        self.env = env
+        self.pending: deque[Decision] = deque()
+
+    def request(self, kind: str, key: str, source) -> simpy.Event:
+        event = self.env.event()
+        self.pending.append(Decision(kind, key, source, event))
+        return event
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+
+class MetricSeries:
+    """Growable columnar (time, value) series.
+
+    Samples are appended into typed arrays with amortized doubling, and
+    `times` / `values` are zero-copy NumPy views of the filled part. Sum,
+    mean and variance are kept as running accumulators (Welford), so the
+    aggregates are O(1) whatever the length of the series.
+
+    `cursor` shares the arrays instead of copying them, writes below the
+    highest shared size copy the arrays first.
+    """
+
+    __slots__ = ("_time", "_value", "_size", "_sum", "_mean", "_m2", "_pinned")
+
+    def __init__(self, capacity: int = 64):
+        self._time = np.empty(capacity, dtype=np.float64)
+        self._value = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._pinned = 0
+
+    def append(self, time: float, value: float = None) -> None:
+        """Add a sample, `append(time, value)` or `append((time, value))`."""
+        if value is None:
+            time, value = time
+        size = self._size
+        if size == len(self._time) or size < self._pinned:
+            self._grow()
+        self._time[size] = time
+        self._value[size] = value
+        self._size = size + 1
+
+        value = float(value)
+        self._sum += value
+        delta = value - self._mean
+        self._mean += delta / self._size
+        self._m2 += delta * (value - self._mean)
+
+    def _grow(self) -> None:
+        capacity = len(self._time)
+        if self._size == capacity:
+            capacity = max(64, 2 * capacity)
+        time = np.empty(capacity, dtype=np.float64)
+        value = np.empty(capacity, dtype=np.float64)
+        time[: self._size] = self._time[: self._size]
+        value[: self._size] = self._value[: self._size]
+        self._time, self._value = time, value
+        self._pinned = 0
+
+    def cursor(self) -> tuple:
+        """Current position, restored with `rewind`."""
+        self._pinned = max(self._pinned, self._size)
+        return (self._time, self._value, self._size, self._sum, self._mean, self._m2)
+
+    def rewind(self, cursor: tuple) -> None:
+        self._time, self._value, self._size, self._sum, self._mean, self._m2 = cursor
+        # Other cursors may share the arrays past this one
+        self._pinned = len(self._time)
+
+    def __getstate__(self) -> dict:
+        return {
+            "time": self.times.copy(),
+            "value": self.values.copy(),
+            "sum": self._sum,
+            "mean": self._mean,
+            "m2": self._m2,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        size = len(state["time"])
+        self.__init__(max(64, size))
+        self._time[:size] = state["time"]
+        self._value[:size] = state["value"]
+        self._size = size
+        self._sum = state["sum"]
+        self._mean = state["mean"]
+        self._m2 = state["m2"]
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._time[: self._size]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._value[: self._size]
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, 0 with fewer than two samples."""
+        return self._m2 / (self._size - 1) if self._size > 1 else 0.0
+
+    def clear(self) -> None:
+        self._size = 0
+        self._sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return zip(self.times.tolist(), self.values.tolist())
+
+    def __getitem__(self, index):
+        return self.times[index], self.values[index]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.column_stack((self.times, self.values)).astype(
+            dtype or np.float64, copy=False
         )
-        for fi in fields(self):
-            values: dict = getattr(self, fi.name)
 
-            for product in values:
-                if len(values[product]) > 0:
-                    df_tmp = pd.DataFrame(values[product], columns=["time", "value"])
-                    df_tmp["variable"] = fi.name
-                    df_tmp["product"] = product
-                    df = df_tmp.copy() if df.empty else pd.concat([df, df_tmp])
-        return df.reset_index(drop=True)
 
+class MetricCounter:
+    """Fixed-size stand-in for `MetricSeries`, used in training mode.
 
-@dataclass
-class ResourceMetrics:
+    Keeps the count, sum, mean and variance of the appended values and
+    drops the samples, so metrics use constant memory whatever the length
+    of the episode. `times` and `values` are always empty.
+    """
 
-    utilization: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    breakdowns: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
-    setups: Dict[str, List[Tuple[float, float]]] = field(default_factory=dict)
+    __slots__ = ("_size", "_sum", "_mean", "_m2")
 
-    def __init__(self, resources: List[str]):
-        self.utilization = {r: [] for r in resources}
-        self.breakdowns = {r: [] for r in resources}
-        self.setups = {r: [] for r in resources}
+    _empty = np.empty(0, dtype=np.float64)
+    _empty.flags.writeable = False
 
-    def to_dataframe(self) -> pd.DataFrame:
-        df = pd.DataFrame(
-            columns=["time", "value", "variable", "resource"],
+    def __init__(self):
+        self.clear()
+
+    def append(self, time: float, value: float = None) -> None:
+        if value is None:
+            time, value = time
+        value = float(value)
+        self._size += 1
+        self._sum += value
+        delta = value - self._mean
+        self._mean += delta / self._size
+        self._m2 += delta * (value - self._mean)
+
+    def cursor(self) -> tuple:
+        """Current position, shaped as `MetricSeries.cursor`."""
+        return (self._empty, self._empty, self._size, self._sum, self._mean, self._m2)
+
+    def rewind(self, cursor: tuple) -> None:
+        _, _, self._size, self._sum, self._mean, self._m2 = cursor
+
+    def __getstate__(self) -> tuple:
+        return (self._size, self._sum, self._mean, self._m2)
+
+    def __setstate__(self, state: tuple) -> None:
+        self._size, self._sum, self._mean, self._m2 = state
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._empty
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._empty
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, 0 with fewer than two samples."""
+        return self._m2 / (self._size - 1) if self._size > 1 else 0.0
+
+    def clear(self) -> None:
+        self._size = 0
+        self._sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return iter(())
+
+    def __array__(self, dtype=None, copy=None):
+        return np.empty((0, 2), dtype=dtype or np.float64)
+
+
+class LevelStats:
+    """Time-weighted statistics of a stock level, updated on every change.
+
+    Counts from `start` (the warmup) on: area under the level, time spent
+    at zero, lowest and highest level. The time average is exact, there is
+    no sampling interval. Queries include the current level up to `now`.
+
+    `cursor` and `rewind` follow `MetricSeries`, so snapshots restore it.
+    """
+
+    __slots__ = ("start", "_time", "_level", "_area", "_zero_time", "_min", "_max")
+
+    _empty = MetricCounter._empty
+
+    def __init__(self, start: float = 0):
+        self.start = start
+        self.clear()
+
+    def add(self, now: float, delta: float) -> None:
+        """Change the level by `delta` at `now`."""
+        level = self._level
+        begin = self._time if self._time > self.start else self.start
+        if now > begin:
+            duration = now - begin
+            self._area += level * duration
+            if level == 0:
+                self._zero_time += duration
+            if level < self._min:
+                self._min = level
+            if level > self._max:
+                self._max = level
+        self._time = now
+        self._level = level + delta
+
+    def _current(self, now: float) -> Tuple[float, float, float, float, float]:
+        """Duration, area, zero time, min and max up to `now`."""
+        level = self._level
+        area, zero_time = self._area, self._zero_time
+        low, high = self._min, self._max
+        begin = self._time if self._time > self.start else self.start
+        if now > begin:
+            area += level * (now - begin)
+            if level == 0:
+                zero_time += now - begin
+            low, high = min(low, level), max(high, level)
+        return max(now - self.start, 0.0), area, zero_time, low, high
+
+    def mean(self, now: float) -> float:
+        duration, area, _, _, _ = self._current(now)
+        return area / duration if duration > 0 else 0.0
+
+    def summary(self, now: float) -> Dict[str, float]:
+        """Mean, min, max and time at zero from `start` to `now`."""
+        duration, area, zero_time, low, high = self._current(now)
+        if duration <= 0:
+            return {"mean": 0.0, "min": 0.0, "max": 0.0, "zero_time": 0.0}
+        return {
+            "mean": area / duration,
+            "min": low,
+            "max": high,
+            "zero_time": zero_time,
+        }
+
+    def cursor(self) -> tuple:
+        """Current position, shaped as `MetricSeries.cursor`."""
+        return (
+            self._empty,
+            self._empty,
+            0,
+            self._time,
+            self._level,
+            self._area,
+            self._zero_time,
+            self._min,
+            self._max,
         )
+
+    def rewind(self, cursor: tuple) -> None:
+        (
+            _,
+            _,
+            _,
+            self._time,
+            self._level,
+            self._area,
+            self._zero_time,
+            self._min,
+            self._max,
+        ) = cursor
+
+    def clear(self) -> None:
+        self._time = 0.0
+        self._level = 0.0
+        self._area = 0.0
+        self._zero_time = 0.0
+        self._min = float("inf")
+        self._max = float("-inf")
+
+
+class MetricsTable:
+    """Long-format export for dataclasses of `Dict[str, MetricSeries]` fields.
+
+    Every column is built with a single allocation from the series arrays,
+    `variable` and the key column (`product` / `resource`) are categorical
+    codes into the field names and keys. `MetricCounter` fields keep no
+    samples and export no rows.
+    """
+
+    key: ClassVar[str]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        variables = [fi.name for fi in fields(self)]
+        keys: Dict[str, int] = {}
+        series: List[Tuple[int, int, MetricSeries]] = []
+        for variable_code, variable in enumerate(variables):
+            for key, values in getattr(self, variable).items():
+                if len(values.times) > 0:
+                    key_code = keys.setdefault(key, len(keys))
+                    series.append((variable_code, key_code, values))
+
+        sizes = [len(values.times) for _, _, values in series]
+        return {
+            "time": np.concatenate(
+                [values.times for _, _, values in series] or [np.empty(0)]
+            ),
+            "value": np.concatenate(
+                [values.values for _, _, values in series] or [np.empty(0)]
+            ),
+            "variable": np.repeat(
+                np.array([code for code, _, _ in series], dtype=np.int16), sizes
+            ),
+            self.key: np.repeat(
+                np.array([code for _, code, _ in series], dtype=np.int32), sizes
+            ),
+            "variable_categories": np.array(variables, dtype=str),
+            f"{self.key}_categories": np.array(list(keys), dtype=str),
+        }
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.frame_from_arrays(self.to_arrays())
+
+    def clear(self) -> None:
         for fi in fields(self):
-            values: dict = getattr(self, fi.name)
+            for values in getattr(self, fi.name).values():
+                values.clear()
+
+    @classmethod
+    def frame_from_arrays(cls, arrays) -> pd.DataFrame:
+        """Build the long-format frame from `to_arrays` or a loaded npz."""
+        return pd.DataFrame(
+            {
+                "time": arrays["time"],
+                "value": arrays["value"],
+                "variable": pd.Categorical.from_codes(
+                    arrays["variable"], arrays["variable_categories"]
+                ),
+                cls.key: pd.Categorical.from_codes(
+                    arrays[cls.key], arrays[f"{cls.key}_categories"]
+                ),
+            }
+        )
+
+    @classmethod
+    def read_npz(cls, path) -> pd.DataFrame:
+        with np.load(path) as arrays:
+            return cls.frame_from_arrays(arrays)
 
-            for resource in values:
-                if len(values[resource]) > 0:
-                    df_tmp = pd.DataFrame(values[resource], columns=["time", "value"])
-                    df_tmp["variable"] = fi.name
-                    df_tmp["resource"] = resource
-                    df = df_tmp.copy() if df.empty else pd.concat([df, df_tmp])
-        return df.reset_index(drop=True)
+    def to_npz(self, path, compressed: bool = True) -> None:
+        save = np.savez_compressed if compressed else np.savez
+        save(path, **self.to_arrays())
+
+    def to_parquet(self, path) -> None:
+        """Write a Parquet file, categorical columns are dictionary encoded.
+
+        Requires pyarrow.
+        """
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow")
+        pq.write_table(
+            pa.Table.from_pandas(self.to_dataframe(), preserve_index=False), path
+        )
+
+
+@dataclass
+class ProductMetrics(MetricsTable):
+    key: ClassVar[str] = "product"
+
+    delivered_ontime: Dict[str, MetricSeries] = field(default_factory=dict)
+    delivered_late: Dict[str, MetricSeries] = field(default_factory=dict)
+    lost_sales: Dict[str, MetricSeries] = field(default_factory=dict)
+    flow_time: Dict[str, MetricSeries] = field(default_factory=dict)
+    lead_time: Dict[str, MetricSeries] = field(default_factory=dict)
+    tardiness: Dict[str, MetricSeries] = field(default_factory=dict)
+    earliness: Dict[str, MetricSeries] = field(default_factory=dict)
+    wip_log: Dict[str, MetricSeries] = field(default_factory=dict)
+    fg_log: Dict[str, MetricSeries] = field(default_factory=dict)
+    released: Dict[str, MetricSeries] = field(default_factory=dict)
+
+    def __init__(self, products, series: Callable = MetricSeries):
+        self.delivered_ontime = {p: series() for p in products}
+        self.delivered_late = {p: series() for p in products}
+        self.lost_sales = {p: series() for p in products}
+        self.flow_time = {p: series() for p in products}
+        self.lead_time = {p: series() for p in products}
+        self.tardiness = {p: series() for p in products}
+        self.earliness = {p: series() for p in products}
+        self.wip_log = {p: series() for p in products}
+        self.fg_log = {p: series() for p in products}
+        self.released = {p: series() for p in products}
 
 
 @dataclass
+class ResourceMetrics(MetricsTable):
+    key: ClassVar[str] = "resource"
+
+    utilization: Dict[str, MetricSeries] = field(default_factory=dict)
+    breakdowns: Dict[str, MetricSeries] = field(default_factory=dict)
+    setups: Dict[str, MetricSeries] = field(default_factory=dict)
+
+    def __init__(self, resources: List[str], series: Callable = MetricSeries):
+        self.utilization = {r: series() for r in resources}
+        self.breakdowns = {r: series() for r in resources}
+        self.setups = {r: series() for r in resources}
+
+
+@dataclass(slots=True)
 class ProductionOrder:
     product: str
     quantity: int
@@ -177,13 +871,10 @@ class ProductionOrder:
     priority: Optional[int] = None
     process_total: Optional[int] = None
     process_finished: Optional[int] = None
-    id: int = field(init=False)
-
-    _next_id = 1
-
-    def __post_init__(self):
-        self.id = ProductionOrder._next_id
-        ProductionOrder._next_id += 1
+    # Assigned from Stores.production_order_ids on release
+    id: Optional[int] = None
+    # Index of `product` in Stores.plant, set on release
+    product_id: Optional[int] = None
 
     def to_dict(self) -> dict:
         keys = [
@@ -199,24 +890,18 @@ class ProductionOrder:
             "id",
         ]
 
-        dict_tmp = {key: self.__dict__[key] for key in keys if key in self.__dict__}
-        return dict_tmp
+        return {key: getattr(self, key) for key in keys}
 
 
-@dataclass
+@dataclass(slots=True)
 class DemandOrder:
     product: str
     quantity: int
     duedate: Optional[float] = None
     arived: Optional[float] = None
     delivered: Optional[int] = None
-    id: int = field(init=False)
-
-    _next_id = 1
-
-    def __post_init__(self):
-        self.id = DemandOrder._next_id
-        DemandOrder._next_id += 1
+    # Assigned from Stores.demand_order_ids on arrival
+    id: Optional[int] = None
 
     def to_dict(self) -> dict:
         keys = [
@@ -228,5 +913,4 @@ class DemandOrder:
             "id",
         ]
 
-        dict_tmp = {key: self.__dict__[key] for key in keys if key in self.__dict__}
-        return dict_tmp
+        return {key: getattr(self, key) for key in keys}
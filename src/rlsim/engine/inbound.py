@@ -1,8 +1,9 @@
+from typing import Dict, Tuple
+
 import simpy
-import numpy as np
 
 from rlsim.engine.control import DemandOrder, Stores
-from rlsim.engine.utils import Distribution
+from rlsim.engine.utils import Distribution, Sampler
 
 
 class Inbound:
@@ -11,30 +12,62 @@ class Inbound:
         stores: Stores,
     ):
         self.stores = stores
-        self.env: simpy.Environment = stores.env
-        self.dist = Distribution(seed=self.stores.seed)
+        self._create_processes()
+
+    def reset(self):
+        self._create_processes()
+
+    def _create_processes(self):
+        self.env: simpy.Environment = self.stores.env
+        self.dist: Dict[str, Distribution] = {
+            product: self.stores.streams.distribution("demand", product)
+            for product in self.stores.products
+        }
+        self.samplers: Dict[str, Tuple[Sampler, Sampler, Sampler]] = {}
+        # Quantity and due date of the next order, drawn with its arrival time
+        self.next_order: Dict[str, Tuple[float, float]] = {}
 
         for product in self.stores.products.keys():
-            self.env.process(self._generate_demand_orders(product))
+            demand_config = self.stores.products[product]["demand"]
+            dist = self.dist[product]
+            self.samplers[product] = tuple(
+                dist.sampler(
+                    demand_config[name].get("dist"), demand_config[name].get("params")
+                )
+                for name in ("freq", "quantity", "duedate")
+            )
+            self.stores.start_process(self, "_generate_demand_orders", product)
 
-    def _generate_demand_orders(self, product):
-        product_config = self.stores.products[product]
+    def reseed(self):
+        """Draw the demand from the start of the stores' current streams."""
+        for product, samplers in self.samplers.items():
+            rng = self.stores.streams.generator("demand", product)
+            for sampler in samplers:
+                sampler.reseed(rng)
 
-        freq_dist = product_config["demand"]["freq"].get("dist")
-        freq_params = product_config["demand"]["freq"].get("params")
-        quantity_dist = product_config["demand"]["quantity"].get("dist")
-        quantity_params = product_config["demand"]["quantity"].get("params")
-        due_dist = product_config["demand"]["duedate"].get("dist")
-        due_params = product_config["demand"]["duedate"].get("params")
+    def get_state(self) -> dict:
+        return {"samplers": self.samplers, "next_order": self.next_order}
 
-        while True:
-            frequency = np.float32(self.dist.random_number(freq_dist, freq_params))
+    def set_state(self, state: dict) -> None:
+        self.env = self.stores.env
+        self.samplers = state["samplers"]
+        self.next_order = state["next_order"]
+
+    def _generate_demand_orders(self, product, wake: float = None):
+        freq_sampler, quantity_sampler, due_sampler = self.samplers[product]
+        frequency = None
 
-            quantity = round(self.dist.random_number(quantity_dist, quantity_params), 0)
-            duedate = np.float32(self.dist.random_number(due_dist, due_params))
+        while True:
+            if wake is None:
+                frequency = freq_sampler()
+                quantity = round(quantity_sampler(), 0)
+                duedate = due_sampler()
+                self.next_order[product] = (quantity, duedate)
 
-            yield self.env.timeout(frequency)
+            yield self.stores.timeout(frequency, wake)
+            wake = None
 
+            quantity, duedate = self.next_order[product]
             duedate += self.env.now
 
             demandOrder = DemandOrder(
@@ -42,6 +75,7 @@ class Inbound:
                 quantity=quantity,
                 duedate=duedate,
                 arived=self.env.now,
+                id=next(self.stores.demand_order_ids),
             )
             # print(f"{self.env.now} - {demandOrder}")
             yield self.stores.inbound_demand_orders.put(demandOrder)
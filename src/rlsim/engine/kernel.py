@@ -0,0 +1,287 @@
+from heapq import heappop, heappush
+from typing import Any, Generator, Optional, Union
+
+import simpy
+from simpy.core import BoundClass, EventPriority, StopSimulation
+from simpy.events import NORMAL, PENDING, URGENT, Event
+from simpy.resources import resource as _resource
+from simpy.resources import store as _store
+
+
+class Timeout(simpy.events.Timeout):
+    """Timeout scheduled directly on the kernel queue."""
+
+    def __init__(self, env: "Kernel", delay: float, value: Any = None):
+        if delay < 0:
+            raise ValueError(f"Negative delay {delay}")
+        self.env = env
+        self.callbacks = []
+        self._value = value
+        self._delay = delay
+        self._ok = True
+        heappush(env._queue, (env._now + delay, NORMAL, next(env._eid), self))
+
+
+class Process(simpy.Process):
+    """Process resumed by a bound method created once.
+
+    Same scheduling as simpy's Process, including its start event, so a
+    model consumes the same event ids on both kernels.
+    """
+
+    def __init__(self, env: "Kernel", generator: Generator):
+        if not hasattr(generator, "throw"):
+            raise ValueError(f"{generator} is not a generator.")
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._generator = generator
+        self._resume = self._resume
+
+        start = Event(env)
+        start.callbacks.append(self._resume)
+        start._ok = True
+        start._value = None
+        heappush(env._queue, (env._now, URGENT, next(env._eid), start))
+        self._target = start
+
+    def _resume(self, event: Event) -> None:
+        env = self.env
+        env._active_proc = self
+        send = self._generator.send
+        while True:
+            try:
+                if event._ok:
+                    event = send(event._value)
+                else:
+                    event._defused = True
+                    exc = type(event._value)(*event._value.args)
+                    exc.__cause__ = event._value
+                    event = self._generator.throw(exc)
+            except StopIteration as e:
+                event = None
+                self._ok = True
+                self._value = e.args[0] if e.args else None
+                heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+                break
+            except BaseException as e:
+                event = None
+                self._ok = False
+                e.__traceback__ = e.__traceback__.tb_next
+                self._value = e
+                heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+                break
+
+            try:
+                callbacks = event.callbacks
+            except AttributeError:
+                raise RuntimeError(f'Invalid yield value "{event}"') from None
+            if callbacks is not None:
+                callbacks.append(self._resume)
+                break
+
+        self._target = event
+        env._active_proc = None
+
+
+class StorePut(_store.StorePut):
+    """Store put that skips the put queue when nothing is waiting in it."""
+
+    def __init__(self, store, item):
+        env = store._env
+        self.env = env
+        self.callbacks = [store._trigger_get]
+        self.resource = store
+        self.proc = env._active_proc
+        self.item = item
+        if not store.put_queue and len(store.items) < store._capacity:
+            store.items.append(item)
+            self._ok = True
+            self._value = None
+            heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+        else:
+            self._value = PENDING
+            store.put_queue.append(self)
+            store._trigger_put(None)
+
+
+class StoreGet(_store.StoreGet):
+    """Store get that skips the get queue when nothing is waiting in it."""
+
+    def __init__(self, store):
+        env = store._env
+        self.env = env
+        self.callbacks = [store._trigger_put]
+        self.resource = store
+        self.proc = env._active_proc
+        if not store.get_queue and store.items:
+            self._ok = True
+            self._value = store.items.pop(0)
+            heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+        else:
+            self._value = PENDING
+            store.get_queue.append(self)
+            store._trigger_get(None)
+
+
+class FilterStoreGet(_store.FilterStoreGet):
+    """FilterStore get that skips the get queue when nothing is waiting in it."""
+
+    def __init__(self, store, filter=lambda item: True):
+        env = store._env
+        self.env = env
+        self.callbacks = [store._trigger_put]
+        self.resource = store
+        self.proc = env._active_proc
+        self.filter = filter
+        self._value = PENDING
+        if not store.get_queue:
+            items = store.items
+            for item in items:
+                if filter(item):
+                    items.remove(item)
+                    self._ok = True
+                    self._value = item
+                    heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+                    return
+        store.get_queue.append(self)
+        store._trigger_get(None)
+
+
+class Store(simpy.Store):
+    put = BoundClass(StorePut)
+    get = BoundClass(StoreGet)
+
+
+class FilterStore(simpy.FilterStore):
+    put = BoundClass(StorePut)
+    get = BoundClass(FilterStoreGet)
+
+
+class Request(_resource.Request):
+    """Resource request granted at once while a slot is free."""
+
+    def __init__(self, resource):
+        env = resource._env
+        self.env = env
+        self.callbacks = [resource._trigger_get]
+        self.resource = resource
+        self.proc = env._active_proc
+        if not resource.put_queue and len(resource.users) < resource._capacity:
+            resource.users.append(self)
+            self.usage_since = env._now
+            self._ok = True
+            self._value = None
+            heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+        else:
+            self._value = PENDING
+            resource.put_queue.append(self)
+            resource._trigger_put(None)
+
+
+class Release(_resource.Release):
+    """Resource release that skips the get queue when nothing is waiting in it."""
+
+    def __init__(self, resource, request):
+        env = resource._env
+        self.env = env
+        self.callbacks = [resource._trigger_put]
+        self.resource = resource
+        self.proc = env._active_proc
+        self.request = request
+        if not resource.get_queue:
+            try:
+                resource.users.remove(request)
+            except ValueError:
+                pass
+            self._ok = True
+            self._value = None
+            heappush(env._queue, (env._now, NORMAL, next(env._eid), self))
+        else:
+            self._value = PENDING
+            resource.get_queue.append(self)
+            resource._trigger_get(None)
+
+
+class Resource(simpy.Resource):
+    request = BoundClass(Request)
+    release = BoundClass(Release)
+
+
+class Kernel(simpy.Environment):
+    """Lightweight event loop for the engine's flow-shop models.
+
+    A simpy Environment with the hot paths cut down. Timeouts, process
+    steps and uncontended store and resource requests push straight onto
+    the heap, skipping the generic trigger loops over the request queues.
+    `run` pops events in a single loop instead of calling `step`. Condition
+    events and interrupts still work through the simpy classes.
+
+    Event ids and priorities are assigned as in simpy, so a model gives
+    the same results, and snapshots, on both kernels. This relies on
+    simpy's private event queue and store attributes, simpy is pinned in
+    pyproject.toml to the version tests/test_kernel.py checks against.
+    """
+
+    timeout = BoundClass(Timeout)
+    process = BoundClass(Process)
+
+    # Primitives created by the components, see `primitive`
+    Store = Store
+    FilterStore = FilterStore
+    Resource = Resource
+
+    def run(self, until: Optional[Union[float, Event]] = None) -> Any:
+        if until is not None:
+            if not isinstance(until, Event):
+                at = until if isinstance(until, int) else float(until)
+                if at <= self._now:
+                    raise ValueError(
+                        f"until ({at}) must be greater than the current simulation "
+                        f"time"
+                    )
+                until = Event(self)
+                until._ok = True
+                until._value = None
+                self.schedule(until, URGENT, at - self._now)
+            elif until.callbacks is None:
+                return until.value
+            until.callbacks.append(StopSimulation.callback)
+
+        queue = self._queue
+        try:
+            while queue:
+                self._now, _, _, event = heappop(queue)
+                callbacks, event.callbacks = event.callbacks, None
+                try:
+                    for callback in callbacks:
+                        callback(event)
+                except StopSimulation:
+                    # Keep the other callbacks for the next run, as simpy does
+                    event.callbacks = callbacks[callbacks.index(callback) + 1 :]
+                    self.schedule(event, EventPriority(-1))
+                    raise
+                if not event._ok and not hasattr(event, "_defused"):
+                    exc = type(event._value)(*event._value.args)
+                    exc.__cause__ = event._value
+                    raise exc
+        except StopSimulation as exc:
+            return exc.args[0]
+
+        if until is not None:
+            raise RuntimeError(
+                f'No scheduled events left but "until" event was not triggered: '
+                f"{until}"
+            )
+        return None
+
+
+def primitive(env: simpy.Environment, name: str) -> type:
+    """simpy class `name` (Store, FilterStore or Resource) for `env`, the
+    kernel's own version when it has one.
+    """
+    return getattr(env, name, getattr(simpy, name))
+
+
+# Event loops selectable with Environment(kernel=...)
+KERNELS = {"simpy": simpy.Environment, "light": Kernel}
@@ -0,0 +1,288 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+if TYPE_CHECKING:
+    from rlsim.engine.control import DemandOrder, ProductionOrder, Stores
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+class ColumnTable:
+    """Rows appended to preallocated typed numpy columns.
+
+    Capacity doubles when full. Columns listed in `categories` hold integer
+    codes into their names and export as categoricals. `cursor` and
+    `rewind` follow `MetricSeries`: rows under a cursor are never written
+    in place again, so snapshots share the columns.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, str],
+        categories: Dict[str, Sequence[str]] = None,
+        capacity: int = 1024,
+    ):
+        self.names = tuple(columns)
+        self.categories = {
+            name: tuple(values) for name, values in (categories or {}).items()
+        }
+        self._columns = [np.empty(capacity, dtype=dtype) for dtype in columns.values()]
+        self._size = 0
+        self._pinned = 0
+
+    def append(self, *row) -> None:
+        """Add a row, values in column order."""
+        size = self._size
+        if size == len(self._columns[0]) or size < self._pinned:
+            self._grow()
+        for column, value in zip(self._columns, row):
+            column[size] = value
+        self._size = size + 1
+
+    def _grow(self) -> None:
+        capacity = len(self._columns[0])
+        if self._size == capacity:
+            capacity = max(64, 2 * capacity)
+        columns = []
+        for column in self._columns:
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            columns.append(grown)
+        self._columns = columns
+        self._pinned = 0
+
+    def cursor(self) -> tuple:
+        """Current position, shaped as `MetricSeries.cursor`.
+
+        Keeps views of the filled rows, a pickled cursor copies only those.
+        """
+        self._pinned = max(self._pinned, self._size)
+        rows = tuple(column[: self._size] for column in self._columns)
+        return (_EMPTY, _EMPTY, 0, rows)
+
+    def rewind(self, cursor: tuple) -> None:
+        rows = cursor[3]
+        size = len(rows[0])
+        if all(row.base is column for row, column in zip(rows, self._columns)):
+            # Other cursors may share the columns past this one
+            self._pinned = len(self._columns[0])
+        else:
+            # Unpickled cursor, or taken before the columns grew
+            columns = []
+            for row in rows:
+                column = np.empty(max(64, 2 * size), dtype=row.dtype)
+                column[:size] = row
+                columns.append(column)
+            self._columns = columns
+            self._pinned = 0
+        self._size = size
+
+    def clear(self) -> None:
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[self.names.index(name)][: self._size]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Copies of the filled columns, with `<column>_categories` names."""
+        arrays = {
+            name: column[: self._size].copy()
+            for name, column in zip(self.names, self._columns)
+        }
+        for name, values in self.categories.items():
+            arrays[f"{name}_categories"] = np.array(values, dtype=str)
+        return arrays
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.frame_from_arrays(self.to_arrays())
+
+    @staticmethod
+    def frame_from_arrays(arrays) -> pd.DataFrame:
+        """Build the frame from `to_arrays` or a loaded npz."""
+        categories = {
+            name[: -len("_categories")]
+            for name in arrays
+            if name.endswith("_categories")
+        }
+        return pd.DataFrame(
+            {
+                name: (
+                    pd.Categorical.from_codes(
+                        arrays[name], arrays[f"{name}_categories"]
+                    )
+                    if name in categories
+                    else arrays[name]
+                )
+                for name in arrays
+                if not name.endswith("_categories")
+            }
+        )
+
+    @classmethod
+    def read_npz(cls, path) -> pd.DataFrame:
+        with np.load(path) as arrays:
+            return cls.frame_from_arrays(arrays)
+
+    def to_npz(self, path, compressed: bool = True) -> None:
+        save = np.savez_compressed if compressed else np.savez
+        save(path, **self.to_arrays())
+
+    def to_parquet(self, path) -> None:
+        """Write a Parquet file, categorical columns are dictionary encoded.
+
+        Requires pyarrow.
+        """
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow")
+        pq.write_table(
+            pa.Table.from_pandas(self.to_dataframe(), preserve_index=False), path
+        )
+
+
+class OrderLedger:
+    """Lifecycle of every order, one typed row per order and operation.
+
+    Filled from the stores hooks, see `Stores(order_ledger=True)`:
+        orders: production orders, when their last operation ends
+        operations: each operation, from the resource taking the order
+            (setup included) to its end
+        demands: demand orders, when delivered
+
+    Products and resources are codes into the plant names. Rows are kept
+    from the start of the run, warmup included. Missing times are nan.
+    """
+
+    TABLES = ("orders", "operations", "demands")
+
+    def __init__(self, stores: "Stores"):
+        self.stores = stores
+        plant = stores.plant
+        self._product_ids = plant.product_ids
+        self._resource_ids = plant.resource_ids
+        products = {"product": plant.products}
+
+        self.orders = ColumnTable(
+            {
+                "id": "int64",
+                "product": "int32",
+                "quantity": "float64",
+                "schedule": "float64",
+                "released": "float64",
+                "duedate": "float64",
+                "finished": "float64",
+                "priority": "float64",
+            },
+            products,
+        )
+        self.operations = ColumnTable(
+            {
+                "id": "int64",
+                "product": "int32",
+                "step": "int16",
+                "resource": "int32",
+                "start": "float64",
+                "end": "float64",
+            },
+            {**products, "resource": plant.resources},
+        )
+        self.demands = ColumnTable(
+            {
+                "id": "int64",
+                "product": "int32",
+                "quantity": "float64",
+                "duedate": "float64",
+                "arived": "float64",
+                "delivered": "float64",
+            },
+            products,
+        )
+        # Time each resource took its current order
+        self._started: Dict[str, float] = {}
+
+        stores.subscribe("order_start", self._order_start)
+        stores.subscribe("order_finish", self._order_finish)
+        stores.subscribe("delivery", self._delivery)
+
+    def _order_start(self, resource: str, order: "ProductionOrder") -> None:
+        self._started[resource] = self.stores.env.now
+
+    def _order_finish(self, resource: str, order: "ProductionOrder") -> None:
+        now = self.stores.env.now
+        self.operations.append(
+            order.id,
+            order.product_id,
+            order.process_finished - 1,
+            self._resource_ids[resource],
+            self._started.pop(resource),
+            now,
+        )
+        if order.process_finished == order.process_total:
+            self.orders.append(
+                order.id,
+                order.product_id,
+                order.quantity,
+                order.schedule,
+                order.released,
+                order.duedate,
+                now,
+                order.priority,
+            )
+
+    def _delivery(self, order: "DemandOrder") -> None:
+        self.demands.append(
+            order.id,
+            self._product_ids[order.product],
+            order.quantity,
+            order.duedate,
+            order.arived,
+            order.delivered,
+        )
+
+    def cursor(self) -> tuple:
+        """Current position, shaped as `MetricSeries.cursor`."""
+        tables = tuple(getattr(self, name).cursor() for name in self.TABLES)
+        return (_EMPTY, _EMPTY, 0, tables, dict(self._started))
+
+    def rewind(self, cursor: tuple) -> None:
+        _, _, _, tables, started = cursor
+        for name, table in zip(self.TABLES, tables):
+            getattr(self, name).rewind(table)
+        self._started = dict(started)
+
+    def clear(self) -> None:
+        for name in self.TABLES:
+            getattr(self, name).clear()
+        self._started = {}
+
+    def to_dataframes(self) -> Dict[str, pd.DataFrame]:
+        return {name: getattr(self, name).to_dataframe() for name in self.TABLES}
+
+    def save(self, folder: Union[str, Path], log_format: str = "npz") -> None:
+        """Write each table to `folder`/order_<table>.<log_format>, the
+        format being csv, npz or parquet.
+        """
+        folder = Path(folder)
+        for name in self.TABLES:
+            table: ColumnTable = getattr(self, name)
+            path = folder / f"order_{name}.{log_format}"
+            match log_format:
+                case "csv":
+                    table.to_dataframe().to_csv(path, index=False)
+                case "npz":
+                    table.to_npz(path)
+                case "parquet":
+                    table.to_parquet(path)
+                case _:
+                    raise ValueError(f"Unknown log format {log_format}")
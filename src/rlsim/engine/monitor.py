@@ -20,11 +20,22 @@ class Monitor:
         self.warmup = warmup
 
         if self.interval > 0:
-            self.env.process(self.run())
+            self.stores.start_process(self, "run")
 
-    def run(self):
+    def reset(self):
+        self.env = self.stores.env
+        if self.interval > 0:
+            self.stores.start_process(self, "run")
+
+    def get_state(self) -> dict:
+        return {}
+
+    def set_state(self, state: dict) -> None:
+        self.env = self.stores.env
+
+    def run(self, wake: float = None):
         start_time = time()
-        yield self.env.timeout(self.warmup)
+        yield self.stores.timeout(self.warmup, wake)
         while True:
             df_status = self.measure_status()
             df_resource = self.measure_resources()
@@ -81,27 +92,24 @@ class Monitor:
 
         df_data = np.zeros(shape=(len(resources_list), len(columns)))
         if self.env.now >= self.stores.warmup:
+            log_resources = self.stores.log_resources
             for i, resource in enumerate(resources_list):
-                if len(self.stores.log_resources.utilization[resource]) > 0:
+                utilization = log_resources.utilization[resource]
+                if len(utilization) > 0:
                     try:
-                        df_data[i, 0] = np.array(
-                            self.stores.log_resources.utilization[resource],
-                            dtype=np.float32,
-                        )[:, 1].sum() / (self.env.now - self.stores.warmup)
+                        df_data[i, 0] = utilization.sum / (
+                            self.env.now - self.stores.warmup
+                        )
                     except ZeroDivisionError:
                         df_data[i, 0] = 0
 
-                df_data[i, 1] = len(self.stores.log_resources.breakdowns[resource])
-                if df_data[i, 1] > 0:
-                    df_data[i, 2] = np.array(
-                        self.stores.log_resources.breakdowns[resource]
-                    )[:, 1].mean()
+                breakdowns = log_resources.breakdowns[resource]
+                df_data[i, 1] = len(breakdowns)
+                df_data[i, 2] = breakdowns.mean
 
-                df_data[i, 3] = len(self.stores.log_resources.setups[resource])
-                if df_data[i, 3] > 0:
-                    df_data[i, 4] = np.array(
-                        self.stores.log_resources.setups[resource]
-                    )[:, 1].mean()
+                setups = log_resources.setups[resource]
+                df_data[i, 3] = len(setups)
+                df_data[i, 4] = setups.mean
 
         df_data = df_data.round(3)
 
@@ -124,118 +132,66 @@ class Monitor:
         ]
 
         df_data = np.zeros(shape=(len(products_list), len(columns)))
-        delivered_ontime = []
-        delivered_late = []
-        lost_sales = []
-        tardiness = []
-        earliness = []
-        flowtime = []
-        leadtime = []
-        wip_log = []
-        fg_log = []
+        # Series columns as (variable, is_mean), totals pool every product.
+        # wip and fg are time averages, the total WIP sums the products
+        variables = [
+            ("delivered_ontime", False),
+            ("delivered_late", False),
+            ("lost_sales", False),
+            ("tardiness", True),
+            ("earliness", True),
+            ("flow_time", True),
+            ("lead_time", True),
+        ]
         if self.env.now >= self.stores.warmup:
+            pooled_sum = np.zeros(len(variables))
+            pooled_count = np.zeros(len(variables))
             for i, product in enumerate(products_list):
-                # Delivered ontime
-                if len(self.stores.log_products.delivered_ontime[product]) > 0:
-                    df_data[i, 0] = np.array(
-                        self.stores.log_products.delivered_ontime[product]
-                    )[:, 1].sum()
-                    delivered_ontime.extend(
-                        self.stores.log_products.delivered_ontime[product]
-                    )
-                # Delivered Late
-                if len(self.stores.log_products.delivered_late[product]) > 0:
-                    df_data[i, 1] = np.array(
-                        self.stores.log_products.delivered_late[product]
-                    )[:, 1].sum()
-                    delivered_late.extend(
-                        self.stores.log_products.delivered_late[product]
-                    )
-                # Lost Sales
-                if len(self.stores.log_products.lost_sales[product]) > 0:
-                    df_data[i, 2] = np.array(
-                        self.stores.log_products.lost_sales[product]
-                    )[:, 1].sum()
-                    lost_sales.extend(self.stores.log_products.lost_sales[product])
-                # Tardiness
-                if len(self.stores.log_products.tardiness[product]) > 0:
-                    df_data[i, 3] = np.array(
-                        self.stores.log_products.tardiness[product]
-                    )[:, 1].mean()
-                    tardiness.extend(self.stores.log_products.tardiness[product])
-                # Earliness
-                if len(self.stores.log_products.earliness[product]) > 0:
-                    df_data[i, 4] = np.array(
-                        self.stores.log_products.earliness[product]
-                    )[:, 1].mean()
-                    earliness.extend(self.stores.log_products.earliness[product])
-                # Flow time
-                if len(self.stores.log_products.flow_time[product]) > 0:
-                    df_data[i, 5] = np.array(
-                        self.stores.log_products.flow_time[product]
-                    )[:, 1].mean()
-                    flowtime.extend(self.stores.log_products.flow_time[product])
-                # Lead time
-                if len(self.stores.log_products.lead_time[product]) > 0:
-                    df_data[i, 6] = np.array(
-                        self.stores.log_products.lead_time[product]
-                    )[:, 1].mean()
-                    leadtime.extend(self.stores.log_products.lead_time[product])
-
-                # Wip
-                if len(self.stores.log_products.wip_log[product]) > 0:
-                    df_data[i, 7] = np.array(self.stores.log_products.wip_log[product])[
-                        :, 1
-                    ].mean()
-                    wip_log.extend(self.stores.log_products.wip_log[product])
-                # Finished Goods
-                if len(self.stores.log_products.fg_log[product]) > 0:
-                    df_data[i, 8] = np.array(self.stores.log_products.fg_log[product])[
-                        :, 1
-                    ].mean()
-                    fg_log.extend(self.stores.log_products.fg_log[product])
+                for j, (variable, is_mean) in enumerate(variables):
+                    series = getattr(self.stores.log_products, variable)[product]
+                    df_data[i, j] = series.mean if is_mean else series.sum
+                    pooled_sum[j] += series.sum
+                    pooled_count[j] += len(series)
+                # Time averages of the levels since the warmup
+                df_data[i, -2] = self.stores.wip_stats[product].mean(self.env.now)
+                df_data[i, -1] = self.stores.fg_stats[product].mean(self.env.now)
+            total_wip = df_data[:, -2].sum()
+            mean_fg = df_data[:, -1].mean()
 
             df_data = df_data.round(3)
 
             df_products = pd.DataFrame(df_data, columns=columns, index=products_list)
             df_products.loc["mean", :] = df_products.mean(axis=0)
 
-            ontime_mean = (
-                np.array(delivered_ontime)[:, 1].sum()
-                if len(delivered_ontime) > 0
-                else 0
-            )
-            late_mean = (
-                np.array(delivered_late)[:, 1].sum() if len(delivered_late) > 0 else 0
-            )
-            lost_mean = np.array(lost_sales)[:, 1].sum() if len(lost_sales) > 0 else 0
-            flowtime_mean = np.array(flowtime)[:, 1].mean() if len(flowtime) > 0 else 0
-            leadtime_mean = np.array(leadtime)[:, 1].mean() if len(leadtime) > 0 else 0
-            tardiness_mean = (
-                np.array(tardiness)[:, 1].mean() if len(tardiness) > 0 else 0
-            )
-            earliness_mean = (
-                np.array(earliness)[:, 1].mean() if len(earliness) > 0 else 0
-            )
-            total_wip_mean = (
-                np.array(self.stores.total_wip_log)[:, 1].mean()
-                if len(self.stores.total_wip_log) > 0
-                else 0
-            )
-            fg_log_mean = np.array(fg_log)[:, 1].mean() if len(fg_log) > 0 else 0
+            totals = {}
+            for j, (variable, is_mean) in enumerate(variables):
+                if not is_mean:
+                    totals[variable] = pooled_sum[j]
+                elif pooled_count[j] > 0:
+                    totals[variable] = pooled_sum[j] / pooled_count[j]
+                else:
+                    totals[variable] = 0
 
             df_products.loc["total", :] = [
-                ontime_mean,
-                late_mean,
-                lost_mean,
-                tardiness_mean,
-                earliness_mean,
-                flowtime_mean,
-                leadtime_mean,
-                total_wip_mean,
-                fg_log_mean,
-            ]
+                totals[variable] for variable, _ in variables
+            ] + [total_wip, mean_fg]
 
             return df_products
         else:
             return pd.DataFrame(columns=columns, index=products_list)
+
+    def measure_levels(self) -> pd.DataFrame:
+        """Time-weighted WIP and finished goods per product since the warmup:
+        mean, min, max and hours at zero.
+        """
+        rows = {}
+        for product in self.stores.products:
+            row = {}
+            for name, stats in (
+                ("wip", self.stores.wip_stats[product]),
+                ("fg", self.stores.fg_stats[product]),
+            ):
+                for key, value in stats.summary(self.env.now).items():
+                    row[f"{name}_{key}"] = value
+            rows[product] = row
+        return pd.DataFrame.from_dict(rows, orient="index").round(3)
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Dict, Literal, Optional
 
 import simpy
 
@@ -12,20 +12,37 @@ class Outbound:
         delivery_mode: Literal["asReady", "onDue", "instantly"] = "asReady",
     ):
         self.stores = stores
-        self.env: simpy.Environment = stores.env
         self.delivery_mode = delivery_mode
+        self._create_processes()
+
+    def reset(self):
+        self._create_processes()
+
+    def _create_processes(self):
+        self.env: simpy.Environment = self.stores.env
+        # Demand order waiting for finished goods, per product
+        self.waiting: Dict[str, Optional[DemandOrder]] = {
+            product: None for product in self.stores.products
+        }
 
         if self.delivery_mode == "asReady":
             for product in self.stores.products.keys():
-                self.env.process(self._delivery_as_ready(product))
+                self.stores.start_process(self, "_delivery_as_ready", product)
 
         elif self.delivery_mode == "onDue":
             for product in self.stores.products.keys():
-                self.env.process(self._delivery_on_duedate(product))
+                self.stores.start_process(self, "_delivery_on_duedate", product)
 
         elif self.delivery_mode == "instantly":
             for product in self.stores.products.keys():
-                self.env.process(self._delivery_instantly(product))
+                self.stores.start_process(self, "_delivery_instantly", product)
+
+    def get_state(self) -> dict:
+        return {"waiting": self.waiting}
+
+    def set_state(self, state: dict) -> None:
+        self.env = self.stores.env
+        self.waiting = state["waiting"]
 
     def _delivery_instantly(self, product):
         while True:
@@ -35,85 +52,98 @@ class Outbound:
 
             quantity = demandOrder.quantity
             if self.stores.finished_goods[product].level >= quantity:
-                yield self.stores.finished_goods[product].get(quantity)
-                if not self.stores.training and self.stores.warmup < self.env.now:
+                self.stores.finished_goods[product].take(quantity)
+                demandOrder.delivered = self.env.now
+                for callback in self.stores.on_delivery:
+                    callback(demandOrder)
+                if self.stores.warmup < self.env.now:
                     self.stores.log_products.delivered_ontime[product].append(
-                        (self.env.now, quantity)
+                        self.env.now, quantity
                     )
 
             elif self.stores.warmup < self.env.now:
                 self.stores.log_products.lost_sales[product].append(
-                    (self.env.now, quantity)
+                    self.env.now, quantity
                 )
 
     def _delivery_as_ready(self, product):
         while True:
-            demandOrder: DemandOrder = yield self.stores.outbound_demand_orders[
-                product
-            ].get()
+            demandOrder = self.waiting[product]
+            if demandOrder is None:
+                demandOrder: DemandOrder = yield self.stores.outbound_demand_orders[
+                    product
+                ].get()
+                self.waiting[product] = demandOrder
             quantity = demandOrder.quantity
             duedate = demandOrder.duedate
 
             # remove from finished goods
             yield self.stores.finished_goods[product].get(quantity)
+            self.waiting[product] = None
             # check ontime or late
             demandOrder.delivered = self.env.now
-            if not self.stores.training and self.stores.warmup < self.env.now:
+            for callback in self.stores.on_delivery:
+                callback(demandOrder)
+            if self.stores.warmup < self.env.now:
                 if demandOrder.delivered <= duedate:
                     self.stores.log_products.delivered_ontime[product].append(
-                        (self.env.now, quantity)
+                        self.env.now, quantity
                     )
                     self.stores.log_products.earliness[product].append(
-                        (self.env.now, demandOrder.duedate - self.env.now)
+                        self.env.now, demandOrder.duedate - self.env.now
                     )
                 else:
                     self.stores.log_products.delivered_late[product].append(
-                        (self.env.now, quantity)
+                        self.env.now, quantity
                     )
                     self.stores.log_products.tardiness[product].append(
-                        (self.env.now, self.env.now - duedate)
+                        self.env.now, self.env.now - duedate
                     )
 
             self.stores.log_products.lead_time[product].append(
-                (self.env.now, self.env.now - demandOrder.arived)
+                self.env.now, self.env.now - demandOrder.arived
             )
 
     def _delivery_on_duedate(self, product):
-        def _delivey_order(demandOrder: DemandOrder):
-            quantity = demandOrder.quantity
-            duedate = demandOrder.duedate
+        while True:
+            demandOrder: DemandOrder = yield self.stores.outbound_demand_orders[
+                product
+            ].get()
 
             # Whait for duedate
-            delay = duedate - self.env.now
+            delay = demandOrder.duedate - self.env.now
             self.env.timeout(delay)
 
-            # Remove from finished goods
-            yield self.stores.finished_goods[product].get(quantity)
+            self.stores.start_process(self, "_deliver_order", demandOrder)
 
-            # Check ontime or late
-            demandOrder.delivered = self.env.now
-            if not self.stores.training and self.stores.warmup < self.env.now:
-                if demandOrder.delivered <= duedate:
-                    self.stores.log_products.delivered_ontime[product].append(
-                        (self.env.now, quantity)
-                    )
-                    self.stores.log_products.earliness[product].append(
-                        (self.env.now, duedate - self.env.now)
-                    )
-                else:
-                    self.stores.log_products.delivered_late[product].append(
-                        (self.env.now, quantity)
-                    )
-                    self.stores.log_products.tardiness[product].append(
-                        (self.env.now, self.env.now - duedate)
-                    )
+    def _deliver_order(self, demandOrder: DemandOrder):
+        product = demandOrder.product
+        quantity = demandOrder.quantity
+        duedate = demandOrder.duedate
 
-                self.stores.log_products.lead_time[product].append(
-                    (self.env.now, self.env.now - demandOrder.arived)
+        # Remove from finished goods
+        yield self.stores.finished_goods[product].get(quantity)
+
+        # Check ontime or late
+        demandOrder.delivered = self.env.now
+        for callback in self.stores.on_delivery:
+            callback(demandOrder)
+        if self.stores.warmup < self.env.now:
+            if demandOrder.delivered <= duedate:
+                self.stores.log_products.delivered_ontime[product].append(
+                    self.env.now, quantity
+                )
+                self.stores.log_products.earliness[product].append(
+                    self.env.now, duedate - self.env.now
+                )
+            else:
+                self.stores.log_products.delivered_late[product].append(
+                    self.env.now, quantity
+                )
+                self.stores.log_products.tardiness[product].append(
+                    self.env.now, self.env.now - duedate
                 )
 
-        while True:
-            demandOrder: DemandOrder = yield self.stores.outbound_demand_orders[
-                product
-            ].get()
-            self.env.process(_delivey_order(demandOrder))
+            self.stores.log_products.lead_time[product].append(
+                self.env.now, self.env.now - demandOrder.arived
+            )
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+Distribution = Tuple[str, Tuple[float, ...]]
+
+
+def _distribution(config: Optional[dict], default: str = None) -> Distribution:
+    config = config or {}
+    return config.get("dist", default), tuple(config.get("params", [0]))
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True)
+class PlantModel:
+    """Products and resources compiled once from their configs.
+
+    Products and resources get integer ids in config order. Step `s` of
+    product `p` runs on resource `next_resource[p, s]`, with processing time
+    distribution `processing[p][s]` and mean `processing_mean[p, s]`.
+    `remaining_mean[p, s]` is the mean processing time from step `s` to the
+    end. Tables have a column past the longest route: `next_resource` is -1
+    once an order finished its steps, padded means are nan and remaining
+    means 0. Arrays are read-only, names are only needed to reach the
+    name-keyed stores and to export results.
+    """
+
+    products: Tuple[str, ...]
+    resources: Tuple[str, ...]
+    product_ids: Dict[str, int]
+    resource_ids: Dict[str, int]
+    process_names: Tuple[Tuple[str, ...], ...]
+    n_steps: np.ndarray
+    next_resource: np.ndarray
+    processing: Tuple[Tuple[Distribution, ...], ...]
+    processing_mean: np.ndarray
+    remaining_mean: np.ndarray
+    setup: Tuple[Distribution, ...]
+    # Time between failures and time to repair, None without breakdowns
+    breakdowns: Tuple[Optional[Tuple[Distribution, Distribution]], ...]
+
+    @classmethod
+    def compile(cls, products: Dict[str, dict], resources: Dict[str, dict]):
+        product_names = tuple(products)
+        resource_names = tuple(resources)
+        resource_ids = {resource: i for i, resource in enumerate(resource_names)}
+
+        steps = [list(products[p].get("processes").items()) for p in product_names]
+        n_steps = np.array([len(s) for s in steps], dtype=np.int32)
+        width = int(n_steps.max(initial=0)) + 1
+        next_resource = np.full((len(product_names), width), -1, dtype=np.int32)
+        processing_mean = np.full((len(product_names), width), np.nan)
+        remaining_mean = np.zeros((len(product_names), width))
+
+        for p, (product, product_steps) in enumerate(zip(product_names, steps)):
+            for s, (process, config) in enumerate(product_steps):
+                resource = config["resource"]
+                if resource not in resource_ids:
+                    raise ValueError(
+                        f"Process {process} of {product} runs on unknown "
+                        f"resource {resource}"
+                    )
+                next_resource[p, s] = resource_ids[resource]
+                processing_mean[p, s] = config["processing_time"]["params"][0]
+            n = n_steps[p]
+            remaining_mean[p, :n] = np.cumsum(processing_mean[p, :n][::-1])[::-1]
+
+        breakdowns = []
+        for resource in resource_names:
+            config = resources[resource]
+            if config.get("tbf") and config.get("ttr"):
+                breakdowns.append(
+                    (
+                        _distribution(config["tbf"], "constant"),
+                        _distribution(config["ttr"], "constant"),
+                    )
+                )
+            else:
+                breakdowns.append(None)
+
+        return cls(
+            products=product_names,
+            resources=resource_names,
+            product_ids={product: i for i, product in enumerate(product_names)},
+            resource_ids=resource_ids,
+            process_names=tuple(
+                tuple(process for process, _ in product_steps)
+                for product_steps in steps
+            ),
+            n_steps=_read_only(n_steps),
+            next_resource=_read_only(next_resource),
+            processing=tuple(
+                tuple(
+                    _distribution(config["processing_time"])
+                    for _, config in product_steps
+                )
+                for product_steps in steps
+            ),
+            processing_mean=_read_only(processing_mean),
+            remaining_mean=_read_only(remaining_mean),
+            setup=tuple(
+                _distribution(resources[resource].get("setup"), "constant")
+                for resource in resource_names
+            ),
+            breakdowns=tuple(breakdowns),
+        )
@@ -1,69 +1,206 @@
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 import simpy
 import simpy.events
 
 from rlsim.engine.control import ProductionOrder, Stores
-from rlsim.engine.utils import Distribution
+from rlsim.engine.kernel import primitive
+from rlsim.engine.state import processed_event
+from rlsim.engine.utils import Sampler
+
+
+@dataclass
+class MachineState:
+    """Progress of a resource on its current order, resumed from snapshots."""
+
+    order: Optional[ProductionOrder] = None
+    setup_time: float = 0.0
+    # Processing start, None during setup
+    start: Optional[float] = None
+    parts_done: int = 0
+    last_product: Optional[str] = None
+    last_process: Optional[int] = None
 
 
 class Production:
-    def __init__(self, stores: Stores, order_selection_fn=None):
+    def __init__(
+        self,
+        stores: Stores,
+        order_selection_fn=None,
+        aggregate_processing: bool = False,
+        agent_dispatching: bool = False,
+        direct_routing: bool = False,
+    ):
         self.stores: Stores = stores
         self.env: simpy.Environment = stores.env
         self.warmup = self.stores.warmup
         self.order_selection_fn = order_selection_fn
-        self.dist = Distribution(seed=self.stores.seed)
+        self.aggregate_processing = aggregate_processing
+        self.agent_dispatching = agent_dispatching
+        # Without transport times, finished operations go straight to the
+        # next queue instead of through the output and transport stores
+        self.direct_routing = direct_routing
+        self._create_samplers()
         self._create_resources()
 
-    def _create_resources(self) -> None:
+    def _create_samplers(self) -> None:
+        self.setup_samplers: Dict[str, Sampler] = {}
+        # Indexed by product id and step
+        self.processing_samplers: List[List[Sampler]] = []
+        self.breakdown_samplers: Dict[str, Tuple[Sampler, Sampler]] = {}
+
+        streams = self.stores.streams
+        plant = self.stores.plant
+
+        for resource, setup, breakdowns in zip(
+            plant.resources, plant.setup, plant.breakdowns
+        ):
+            setup_dist = streams.distribution("setup", resource)
+            self.setup_samplers[resource] = setup_dist.sampler(*setup)
+
+            if breakdowns:
+                dist = streams.distribution("breakdowns", resource)
+                tbf, ttr = breakdowns
+                self.breakdown_samplers[resource] = (
+                    dist.sampler(*tbf),
+                    dist.sampler(*ttr),
+                )
+
+        for product, process_names, processing in zip(
+            plant.products, plant.process_names, plant.processing
+        ):
+            self.processing_samplers.append(
+                [
+                    streams.distribution("processing", product, process_name).sampler(
+                        *distribution
+                    )
+                    for process_name, distribution in zip(process_names, processing)
+                ]
+            )
+
+    def reset(self) -> None:
+        """Start a new episode on the stores' environment, keeping the
+        compiled samplers and drawing them from the new streams.
+        """
+        self.env = self.stores.env
+        self.reseed()
+        self._create_resources()
+
+    def reseed(self) -> None:
+        """Draw every sampler from the start of the stores' current streams."""
+        streams = self.stores.streams
+
+        for resource, sampler in self.setup_samplers.items():
+            sampler.reseed(streams.generator("setup", resource))
+
+        plant = self.stores.plant
+        for product, process_names, samplers in zip(
+            plant.products, plant.process_names, self.processing_samplers
+        ):
+            for process_name, sampler in zip(process_names, samplers):
+                sampler.reseed(streams.generator("processing", product, process_name))
+
+        for resource, samplers in self.breakdown_samplers.items():
+            rng = streams.generator("breakdowns", resource)
+            for sampler in samplers:
+                sampler.reseed(rng)
+
+    def get_state(self) -> dict:
+        return {
+            "setup_samplers": self.setup_samplers,
+            "processing_samplers": self.processing_samplers,
+            "breakdown_samplers": self.breakdown_samplers,
+            "machine_state": self.machine_state,
+            "breakdown_state": self.breakdown_state,
+            "down": [
+                r for r, event in self.machine_down.items() if not event.triggered
+            ],
+        }
+
+    def set_state(self, state: dict) -> None:
+        """Recreate the resources from `get_state`, without processes."""
+        self.env = self.stores.env
+        self.setup_samplers = state["setup_samplers"]
+        self.processing_samplers = state["processing_samplers"]
+        self.breakdown_samplers = state["breakdown_samplers"]
+
+        self._create_resources(start=False)
+        self.machine_state = state["machine_state"]
+        self.breakdown_state = state["breakdown_state"]
+        for resource in self.stores.resources:
+            if resource in state["down"]:
+                self.machine_down[resource] = self.env.event()
+            else:
+                self.machine_down[resource] = processed_event(self.env)
+
+    def _create_resources(self, start: bool = True) -> None:
         self.resources: Dict[str, simpy.Resource] = {}
         self.machine_down: Dict[str, simpy.Event] = {}
+        self.aggregate: Dict[str, bool] = {}
+        self.machine_state: Dict[str, MachineState] = {}
+        # Pending repair time and breakdown start, None while running
+        self.breakdown_state: Dict[str, Tuple[float, Optional[float]]] = {}
+
+        Resource = primitive(self.env, "Resource")
 
         for resource in self.stores.resources:
             resource_config: dict = self.stores.resources.get(resource)
             quantity = resource_config.get("quantity", 1)
 
-            self.resources[resource] = simpy.Resource(self.env, quantity)
+            # Resource config overrides the global processing mode
+            self.aggregate[resource] = resource_config.get(
+                "aggregate_processing", self.aggregate_processing
+            )
+
+            self.resources[resource] = Resource(self.env, quantity)
+            self.machine_state[resource] = MachineState()
+            self.breakdown_state[resource] = (None, None)
+
+            if not start:
+                continue
 
             self.machine_down[resource] = self.env.event()
             self.machine_down[resource].succeed()
 
-            if self.stores.resources[resource].get(
-                "tbf", None
-            ) and self.stores.resources[resource].get("ttr", None):
-                self.env.process(self._breakdowns(resource))
+            if resource in self.breakdown_samplers:
+                self.stores.start_process(self, "_breakdowns", resource)
 
-            self.env.process(self._transportation(resource))
-            self.env.process(self._production_system(resource))
+            if not self.direct_routing:
+                self.stores.start_process(self, "_transportation", resource)
+            self.stores.start_process(self, "_production_system", resource)
 
-    def _breakdowns(self, resource):
+    def _breakdowns(self, resource, wake: float = None):
+        tbf_sampler, ttr_sampler = self.breakdown_samplers[resource]
+        tbf = None
+
+        # A negative time between failures or to repair ends the breakdowns
+        # of the resource, the timeout raises ValueError
         try:
             while True:
-                tbf_dist = self.stores.resources[resource]["tbf"].get(
-                    "dist", "constant"
-                )
-                tbf_params = self.stores.resources[resource]["tbf"].get("params", [0])
-                tbf = self.dist.random_number(tbf_dist, tbf_params)
-
-                ttr_dist = self.stores.resources[resource]["ttr"].get(
-                    "dist", "constant"
-                )
-                ttr_params = self.stores.resources[resource]["ttr"].get("params", [0])
-                ttr = self.dist.random_number(ttr_dist, ttr_params)
-
-                yield self.env.timeout(tbf)
-                self.machine_down[resource] = self.env.event()
-                breakdown_start = self.env.now
-                yield self.env.timeout(ttr)
+                ttr, breakdown_start = self.breakdown_state[resource]
+                if breakdown_start is None:
+                    if wake is None:
+                        tbf = tbf_sampler()
+                        ttr = ttr_sampler()
+                        self.breakdown_state[resource] = (ttr, None)
+
+                    yield self.stores.timeout(tbf, wake)
+                    wake = None
+                    self.machine_down[resource] = self.env.event()
+                    breakdown_start = self.env.now
+                    self.breakdown_state[resource] = (ttr, breakdown_start)
+
+                yield self.stores.timeout(ttr, wake)
+                wake = None
                 self.machine_down[resource].succeed()
+                self.breakdown_state[resource] = (None, None)
                 breakdown_end = self.env.now
 
                 if self.env.now >= self.warmup:
                     self.stores.log_resources.breakdowns[resource].append(
-                        (breakdown_start, round(breakdown_end - breakdown_start, 6))
+                        breakdown_start, round(breakdown_end - breakdown_start, 6)
                     )
-
         except ValueError:
             pass
 
@@ -75,98 +212,146 @@ class Production:
             yield self.stores.resource_transport[resource].put(productionOrder)
 
             product = productionOrder.product
-            if productionOrder.process_total == productionOrder.process_finished:
+            next_resource = self.stores.plant.next_resource[
+                productionOrder.product_id, productionOrder.process_finished
+            ]
+            if next_resource < 0:
                 productionOrder.finished = self.env.now
+                self.stores.wip_index.remove(productionOrder)
                 yield self.stores.resource_transport[resource].get()
-                yield self.stores.finished_goods[product].put(productionOrder.quantity)
+                self.stores.finished_goods[product].put(productionOrder.quantity)
 
                 self.stores.log_products.flow_time[product].append(
-                    (self.env.now, self.env.now - productionOrder.released)
+                    self.env.now, self.env.now - productionOrder.released
                 )
-                yield self.stores.wip[product].get(productionOrder.quantity)
+                self.stores.wip[product].take(productionOrder.quantity)
 
             else:
-                process_id = productionOrder.process_finished
-                next_resource = self.stores.processes_value_list[product][process_id][
-                    "resource"
-                ]
-
                 yield self.stores.resource_transport[resource].get()
-                yield self.stores.resource_input[next_resource].put(productionOrder)
-
-    def _production_system(self, resource):
-        last_process = None
-        last_product = None
+                yield self.stores.input_queues[next_resource].put(productionOrder)
+
+    def _route(self, productionOrder: ProductionOrder) -> None:
+        """Move an order to its next queue, or to finished goods, at once.
+
+        Same transfers as `_transportation`, the unbounded queue put
+        succeeds immediately so nothing waits on it.
+        """
+        product = productionOrder.product
+        next_resource = self.stores.plant.next_resource[
+            productionOrder.product_id, productionOrder.process_finished
+        ]
+        if next_resource < 0:
+            productionOrder.finished = self.env.now
+            self.stores.wip_index.remove(productionOrder)
+            self.stores.finished_goods[product].put(productionOrder.quantity)
+            self.stores.log_products.flow_time[product].append(
+                self.env.now, self.env.now - productionOrder.released
+            )
+            self.stores.wip[product].take(productionOrder.quantity)
+        else:
+            self.stores.input_queues[next_resource].put(productionOrder)
+
+    def _production_system(self, resource, wake: float = None):
+        state = self.machine_state[resource]
 
         while True:
-            yield self.machine_down[resource]
-
-            # Get order from queue
-            queue_len = len(self.stores.resource_input[resource].items)
-            if self.order_selection_fn is not None and queue_len > 1:
-                productionOrderId = self.order_selection_fn(self.stores, resource)
-                productionOrder: ProductionOrder = yield self.stores.resource_input[
-                    resource
-                ].get(lambda item: item.id == productionOrderId)
-            else:
-                productionOrder: ProductionOrder = yield self.stores.resource_input[
-                    resource
-                ].get()
-
-            yield self.stores.resource_processing[resource].put(productionOrder)
-
+            if state.order is None:
+                yield self.machine_down[resource]
+
+                # Get order from queue, by id when selected or by dispatching rule
+                queue = self.stores.resource_input[resource]
+                if self.agent_dispatching and len(queue) > 1:
+                    selectedOrder: ProductionOrder = (
+                        yield self.stores.decisions.request("dispatch", resource, queue)
+                    )
+                    productionOrder: ProductionOrder = yield queue.get(
+                        order_id=selectedOrder.id
+                    )
+                elif self.order_selection_fn is not None and len(queue) > 1:
+                    productionOrderId = self.order_selection_fn(self.stores, resource)
+                    productionOrder: ProductionOrder = yield queue.get(
+                        order_id=productionOrderId
+                    )
+                else:
+                    productionOrder: ProductionOrder = yield queue.get()
+
+                self.stores.processing[resource] = productionOrder
+
+                product = productionOrder.product
+                process = productionOrder.process_finished
+
+                # Check setup
+                if state.last_product == product and state.last_process == process:
+                    setup_time = 0
+                else:
+                    setup_time = self.setup_samplers[resource]()
+                    if self.env.now >= self.warmup:
+                        self.stores.log_resources.setups[resource].append(
+                            self.env.now, setup_time
+                        )
+
+                state.last_process = process
+                state.order = productionOrder
+                state.setup_time = setup_time
+                state.start = None
+                state.parts_done = 0
+
+                for callback in self.stores.on_order_start:
+                    callback(resource, productionOrder)
+
+            productionOrder = state.order
             product = productionOrder.product
             process = productionOrder.process_finished
 
-            # Check setup
-            if last_product == product and last_process == process:
-                setup_time = 0
-            else:
-                setup_dist = self.stores.resources[resource]["setup"].get(
-                    "dist", "constant"
-                )
-                setup_params = self.stores.resources[resource]["setup"].get(
-                    "params", [0]
-                )
-                setup_time = self.dist.random_number(setup_dist, setup_params)
-                if self.env.now >= self.warmup:
-                    self.stores.log_resources.setups[resource].append(
-                        (self.env.now, setup_time)
-                    )
-
-            last_process = process
-
             with self.resources[resource].request() as req:
-                yield req
+                # A resumed process gets the free resource without waiting
+                if wake is None:
+                    yield req
 
-                yield self.env.timeout(setup_time)
+                if state.start is None:
+                    yield self.stores.timeout(state.setup_time, wake)
+                    wake = None
+                    state.start = self.env.now
 
-                process_time_dist = self.stores.processes_value_list[product][process][
-                    "processing_time"
-                ].get("dist")
-                process_time_params = self.stores.processes_value_list[product][
-                    process
-                ]["processing_time"].get("params")
+                processing_sampler = self.processing_samplers[
+                    productionOrder.product_id
+                ][process]
 
                 order_quantity = productionOrder.quantity
 
-                start_time = self.env.now
-
-                for part in range(int(order_quantity)):
-                    processing_time = self.dist.random_number(
-                        process_time_dist, process_time_params
-                    )
-
-                    yield self.env.timeout(processing_time)
+                if self.aggregate[resource]:
+                    # One event per order, total time from the sum distribution
+                    if wake is None:
+                        processing_time = processing_sampler.sum(order_quantity)
+                        yield self.env.timeout(processing_time)
+                    else:
+                        yield self.stores.timeout(None, wake)
+                        wake = None
+                else:
+                    parts = int(order_quantity)
+                    while state.parts_done < parts:
+                        if wake is None:
+                            processing_time = processing_sampler()
+                            yield self.env.timeout(processing_time)
+                        else:
+                            yield self.stores.timeout(None, wake)
+                            wake = None
+                        state.parts_done += 1
 
                 # Register data in order
                 productionOrder.process_finished += 1
+                state.order = None
 
+                start_time = state.start
                 end_time = self.env.now
-                yield self.stores.resource_processing[resource].get()
-                yield self.stores.resource_finished[resource].put(productionOrder)
-                yield self.stores.resource_output[resource].put(productionOrder)
+                self.stores.processing[resource] = None
+                for callback in self.stores.on_order_finish:
+                    callback(resource, productionOrder)
+                if self.direct_routing:
+                    self._route(productionOrder)
+                else:
+                    yield self.stores.resource_output[resource].put(productionOrder)
                 if self.env.now >= self.warmup:
                     self.stores.log_resources.utilization[resource].append(
-                        (self.env.now, round(end_time - start_time, 6))
+                        self.env.now, round(end_time - start_time, 6)
                     )
@@ -0,0 +1,282 @@
+from collections import deque
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import simpy
+from simpy.core import BoundClass
+from simpy.resources import base
+from simpy.resources.store import StorePut
+
+from rlsim.engine.plant import PlantModel
+
+DISPATCHING_RULES = ("fifo", "edd", "spt", "cr")
+
+
+class OrderQueueGet(base.Get):
+    """Request an order from an OrderQueue.
+
+    Without arguments the order with the lowest dispatching key is returned.
+    `order_id` requests a specific order in O(log n). A `filter` function is
+    still accepted for FilterStore compatibility and scans the queue.
+    """
+
+    def __init__(
+        self,
+        resource: "OrderQueue",
+        filter: Optional[Callable] = None,
+        order_id: Optional[int] = None,
+    ):
+        self.filter = filter
+        self.order_id = order_id
+        super().__init__(resource)
+
+
+class OrderQueuePut(StorePut):
+    """Put an order into an OrderQueue, which addresses orders by id."""
+
+    def __init__(self, resource: "OrderQueue", item):
+        if item.id is None:
+            raise ValueError(
+                f"{item} has no id, release it with Scheduler.release_order or "
+                f"set its id from Stores.production_order_ids"
+            )
+        super().__init__(resource, item)
+
+
+class OrderQueue(base.BaseResource):
+    """Order store indexed by order id and ordered by a dispatching rule.
+
+    Drop-in replacement for the FilterStore used as `Stores.resource_input`.
+    Built-in rules:
+        fifo: put order
+        edd: earliest `duedate`
+        spt: shortest expected processing time of the current operation
+        cr: lowest critical ratio, (duedate - now) / remaining processing time
+
+    spt and cr read the mean times of `plant`, indexed by the order's
+    product id and step when it is put. Static rules (fifo, edd, spt) keep
+    a heap with lazy deletion, so pop-min and removal by id are O(log n).
+    The critical ratio changes with time, so it is evaluated vectorized
+    over typed arrays when an order is popped.
+    """
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        rule: str = "fifo",
+        plant: Optional[PlantModel] = None,
+    ):
+        if rule not in DISPATCHING_RULES:
+            raise ValueError(
+                f"Unknown dispatching rule {rule}, expected one of {DISPATCHING_RULES}"
+            )
+        if rule in ("spt", "cr") and plant is None:
+            raise ValueError(f"Dispatching rule {rule} needs the plant model")
+        super().__init__(env, float("inf"))
+        self.rule = rule
+
+        # Mean time of each (product id, step): of the step for spt, from
+        # the step to the end for cr
+        self._times: Optional[np.ndarray] = None
+        if rule == "spt":
+            self._times = plant.processing_mean
+        elif rule == "cr":
+            self._times = plant.remaining_mean
+
+        self._orders: Dict[int, object] = {}
+        self._items_cache: Optional[list] = None
+        self._seq = count()
+
+        # Static rules: heap of (key, seq, order_id), seq validates entries
+        self._heap: List[Tuple[float, int, int]] = []
+        self._entry_seq: Dict[int, int] = {}
+
+        # Critical ratio: typed arrays with swap-remove
+        self._slot: Dict[int, int] = {}
+        self._ids = np.zeros(16, dtype=np.int64)
+        self._due = np.zeros(16, dtype=np.float64)
+        self._work = np.zeros(16, dtype=np.float64)
+
+    put = BoundClass(OrderQueuePut)
+    get = BoundClass(OrderQueueGet)
+
+    @property
+    def items(self) -> list:
+        """Queued orders in arrival order."""
+        if self._items_cache is None:
+            self._items_cache = list(self._orders.values())
+        return self._items_cache
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def get_state(self) -> Tuple[list, List[int]]:
+        """Queued orders in arrival order and order ids in slot order."""
+        return list(self._orders.values()), self._ids[: len(self._slot)].tolist()
+
+    def set_state(self, state: Tuple[list, List[int]]) -> None:
+        """Queue the orders of `get_state`, keeping their dispatching order."""
+        orders, slots = state
+        if self.rule == "cr":
+            by_id = {order.id: order for order in orders}
+            for order_id in slots:
+                self._insert(by_id[order_id])
+            self._orders = by_id
+        else:
+            for order in orders:
+                self._insert(order)
+
+    def _insert(self, order) -> None:
+        order_id = order.id
+        self._orders[order_id] = order
+        self._items_cache = None
+        seq = next(self._seq)
+
+        if self.rule == "cr":
+            slot = len(self._slot)
+            if slot == len(self._ids):
+                self._ids = np.resize(self._ids, 2 * slot)
+                self._due = np.resize(self._due, 2 * slot)
+                self._work = np.resize(self._work, 2 * slot)
+            work = (
+                order.quantity * self._times[order.product_id, order.process_finished]
+            )
+            self._ids[slot] = order_id
+            self._due[slot] = np.inf if order.duedate is None else order.duedate
+            self._work[slot] = max(work, 1e-9)
+            self._slot[order_id] = slot
+        else:
+            match self.rule:
+                case "fifo":
+                    key = seq
+                case "edd":
+                    key = float("inf") if order.duedate is None else order.duedate
+                case _:
+                    key = (
+                        order.quantity
+                        * self._times[order.product_id, order.process_finished]
+                    )
+            self._entry_seq[order_id] = seq
+            heappush(self._heap, (key, seq, order_id))
+
+    def _remove(self, order_id: int):
+        order = self._orders.pop(order_id)
+        self._items_cache = None
+
+        if self.rule == "cr":
+            slot = self._slot.pop(order_id)
+            last = len(self._slot)
+            if slot != last:
+                moved_id = int(self._ids[last])
+                self._ids[slot] = moved_id
+                self._due[slot] = self._due[last]
+                self._work[slot] = self._work[last]
+                self._slot[moved_id] = slot
+        else:
+            del self._entry_seq[order_id]
+            # Stale heap entries are skipped on pop, compact when they dominate
+            if len(self._heap) > 2 * len(self._orders) + 64:
+                self._heap = [
+                    entry
+                    for entry in self._heap
+                    if self._entry_seq.get(entry[2]) == entry[1]
+                ]
+                heapify(self._heap)
+        return order
+
+    def _pop_min(self):
+        if self.rule == "cr":
+            size = len(self._slot)
+            ratio = (self._due[:size] - self._env.now) / self._work[:size]
+            return self._remove(int(self._ids[int(np.argmin(ratio))]))
+
+        heap = self._heap
+        while heap:
+            _, seq, order_id = heappop(heap)
+            if self._entry_seq.get(order_id) == seq:
+                return self._remove(order_id)
+        return None
+
+    def _do_put(self, event: OrderQueuePut) -> Optional[bool]:
+        self._insert(event.item)
+        event.succeed()
+        return None
+
+    def _do_get(self, event: OrderQueueGet) -> Optional[bool]:
+        if not self._orders:
+            return True
+
+        if event.order_id is not None:
+            if event.order_id in self._orders:
+                event.succeed(self._remove(event.order_id))
+        elif event.filter is not None:
+            for order in self.items:
+                if event.filter(order):
+                    event.succeed(self._remove(order.id))
+                    break
+        else:
+            event.succeed(self._pop_min())
+        return True
+
+
+class InventoryGet(simpy.Event):
+    """Request for `amount` from an Inventory, succeeded once served."""
+
+    def __init__(self, inventory: "Inventory", amount: float):
+        super().__init__(inventory.env)
+        self.inventory = inventory
+        self.amount = amount
+
+
+class Inventory:
+    """Stock level kept as a plain number, replacing a simpy.Container.
+
+    `put` and `take` change `level` at once without scheduling events, for
+    sites that can never block. Consumers waiting for stock use `get`,
+    whose event succeeds when the level covers the amount. Waiting gets are
+    served in request order, the first one blocks the others as in a
+    Container.
+
+    Every change is reported to the `stats` accumulators, e.g. `LevelStats`.
+    """
+
+    def __init__(self, env: simpy.Environment, init: float = 0, stats: tuple = ()):
+        self.env = env
+        self.level = init
+        self.stats = stats
+        self.waiters: deque[InventoryGet] = deque()
+
+    def put(self, amount: float) -> None:
+        self.level += amount
+        now = self.env.now
+        for stats in self.stats:
+            stats.add(now, amount)
+        if self.waiters:
+            self._serve()
+
+    def take(self, amount: float) -> None:
+        """Remove `amount` now, the level must cover it."""
+        if amount > self.level:
+            raise ValueError(f"Cannot take {amount}, level is {self.level}")
+        self.level -= amount
+        now = self.env.now
+        for stats in self.stats:
+            stats.add(now, -amount)
+
+    def get(self, amount: float) -> InventoryGet:
+        event = InventoryGet(self, amount)
+        self.waiters.append(event)
+        self._serve()
+        return event
+
+    def _serve(self) -> None:
+        waiters = self.waiters
+        while waiters and waiters[0].amount <= self.level:
+            event = waiters.popleft()
+            self.take(event.amount)
+            event.succeed()
@@ -6,34 +6,68 @@ from rlsim.engine.control import ProductionOrder, Stores, DemandOrder
 
 
 class Scheduler(ABC):
-    def __init__(self, store: Stores, run_scheduler: bool = True):
+    # Whether the scheduler has release ticks the agent can decide on
+    release_decisions = False
+
+    def __init__(
+        self, store: Stores, run_scheduler: bool = True, agent_release: bool = False
+    ):
+        if agent_release and not self.release_decisions:
+            raise ValueError(
+                f"{type(self).__name__} releases on demand arrival and has no "
+                f"release decisions"
+            )
         self.stores = store
         self.env: simpy.Environment = store.env
+        self._run_scheduler = run_scheduler
+        self.agent_release = agent_release
 
         if run_scheduler:
             self.run_scheduler()
 
-    def release_order(self, productionOrder: ProductionOrder):
-        product = productionOrder.product
+    def reset(self):
+        self.env = self.stores.env
+        if self._run_scheduler:
+            self.run_scheduler()
 
-        last_process = len(self.stores.products[product]["processes"])
-        first_process = next(iter(self.stores.products[product]["processes"]))
-        first_resource = self.stores.products[product]["processes"][first_process][
-            "resource"
-        ]
+    def get_state(self) -> dict:
+        return {}
 
-        productionOrder.process_total = last_process
-        productionOrder.process_finished = 0
+    def set_state(self, state: dict) -> None:
+        self.env = self.stores.env
 
-        productionOrder.released = self.env.now
+    def release_order(self, productionOrder: ProductionOrder, wake: float = None):
+        """Release `productionOrder` to its first resource.
 
-        yield self.stores.wip[product].put(productionOrder.quantity)
-        # Add productionOrder to first resource input
-        yield self.stores.resource_input[first_resource].put(productionOrder)
+        Start it with `Stores.start_process`, so snapshots resume it.
+        """
+        product = productionOrder.product
+        if wake is None:
+            plant = self.stores.plant
+            product_id = plant.product_ids[product]
+
+            if productionOrder.id is None:
+                productionOrder.id = next(self.stores.production_order_ids)
+            productionOrder.product_id = product_id
+            productionOrder.process_total = int(plant.n_steps[product_id])
+            productionOrder.process_finished = 0
+
+            productionOrder.released = self.env.now
+            self.stores.wip_index.add(productionOrder)
+
+            self.stores.wip[product].put(productionOrder.quantity)
+            # Add productionOrder to first resource input
+            first_resource = plant.next_resource[product_id, 0]
+            yield self.stores.input_queues[first_resource].put(productionOrder)
+        else:
+            # Resumed after the order was queued
+            yield self.stores.timeout(None, wake)
 
         self.stores.log_products.released[product].append(
-            (self.env.now, productionOrder.quantity)
+            self.env.now, productionOrder.quantity
         )
+        for callback in self.stores.on_release:
+            callback(productionOrder)
 
     def scheduler(self, product):
         while True:
@@ -46,11 +80,11 @@ class Scheduler(ABC):
             productionOrder.duedate = demandOrder.duedate
             productionOrder.priority = 0
 
-            self.env.process(self.release_order(productionOrder))
+            self.stores.start_process(self, "release_order", productionOrder)
 
             yield self.stores.outbound_demand_orders[product].put(demandOrder)
             # print(productionOrder)
 
     def run_scheduler(self):
         for product in self.stores.products.keys():
-            self.env.process(self.scheduler(product))
+            self.stores.start_process(self, "scheduler", product)
@@ -0,0 +1,106 @@
+from heapq import heappush
+from typing import Dict, List, Tuple
+
+import simpy
+from simpy.core import NORMAL
+
+from rlsim.engine.queues import InventoryGet
+
+
+class TimeoutAt(simpy.events.Timeout):
+    """Timeout firing exactly at the absolute time `at`.
+
+    Used by processes resumed from a snapshot, `env.timeout(at - env.now)`
+    could be off by one ulp and break ties with other events.
+    """
+
+    def __init__(self, env: simpy.Environment, at: float, value=None):
+        if at < env.now:
+            raise ValueError(f"Timeout at {at} is in the past (now {env.now})")
+        self.env = env
+        self.callbacks = []
+        self._value = value
+        self._delay = at - env.now
+        self._ok = True
+        heappush(env._queue, (at, NORMAL, next(env._eid), self))
+
+
+def processed_event(env: simpy.Environment) -> simpy.Event:
+    """Event that is already succeeded and processed, yielding it does not
+    wait for the event loop.
+    """
+    event = env.event()
+    event._ok = True
+    event._value = None
+    event.callbacks = None
+    return event
+
+
+def wait_keys(
+    env: simpy.Environment, processes: List[simpy.Process], decisions
+) -> List[Tuple[tuple, float]]:
+    """Sort key and wake time of the event each process waits on.
+
+    Processes resumed in key order recreate their waits in the original
+    order: timeouts by (time, priority, eid), store and inventory requests
+    by position in their queue and agent decisions by position in the
+    decision queue.
+    """
+    scheduled: Dict[simpy.Event, tuple] = {
+        event: (time, priority, eid) for time, priority, eid, event in env._queue
+    }
+    decision_events = {decision.event: i for i, decision in enumerate(decisions)}
+
+    keys = []
+    for process in processes:
+        target = process.target
+        if target in scheduled:
+            time, priority, eid = scheduled[target]
+            keys.append(((0, time, priority, eid), time))
+        elif target in decision_events:
+            keys.append(((2, decision_events[target], 0, 0), None))
+        elif isinstance(target, InventoryGet):
+            keys.append(((1, target.inventory.waiters.index(target), 0, 0), None))
+        elif isinstance(target, simpy.resources.base.Get):
+            keys.append(((1, target.resource.get_queue.index(target), 0, 0), None))
+        elif isinstance(target, simpy.resources.base.Put):
+            keys.append(((1, target.resource.put_queue.index(target), 0, 0), None))
+        else:
+            keys.append(((3, 0, 0, 0), None))
+    return keys
+
+
+class Snapshot:
+    """Simulation state at one instant, see `Environment.snapshot`.
+
+    `state` holds the pickled orders, stores, samplers and process resume
+    points. Metric series are append-only, so `metrics` only keeps cursors
+    into their arrays, shared with the live series until they are written.
+    Pickling a snapshot copies the metrics it covers, e.g. to restore it in
+    another process.
+    """
+
+    __slots__ = ("time", "state", "metrics")
+
+    def __init__(self, time: float, state: bytes, metrics: list):
+        self.time = time
+        self.state = state
+        self.metrics = metrics
+
+    def __getstate__(self) -> dict:
+        # Pickled snapshots own a copy of the filled part of the metrics
+        metrics = [
+            (time[:size].copy(), value[:size].copy(), size, *aggregates)
+            for time, value, size, *aggregates in self.metrics
+        ]
+        return {"time": self.time, "state": self.state, "metrics": metrics}
+
+    def __setstate__(self, state: dict) -> None:
+        self.time = state["time"]
+        self.state = state["state"]
+        self.metrics = state["metrics"]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the pickled state, metric arrays are shared."""
+        return len(self.state)
@@ -1,46 +1,240 @@
+import hashlib
 import random
-from typing import List
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple, Union
 
 import numpy as np
 
+BLOCK_SIZE = 4096
 
-class Distribution:
-    def __init__(self, seed):
-        self.rng = random.Random(seed)
 
-    def random_number(self, distribution: str, params: list) -> float:
-        value = 0
+class Sampler:
+    """Sampler compiled once for a (distribution, params) pair.
+
+    Values are drawn in blocks from a numpy Generator and handed out from a
+    buffer. Blocks start small and double up to `block_size`, so samplers
+    that are rarely used (e.g. breakdowns) do not pay for a full block.
+
+    Pickling keeps the generator state from before the last block instead
+    of the buffered values, the buffer is drawn again on the first call
+    after unpickling.
+    """
+
+    __slots__ = (
+        "distribution",
+        "params",
+        "rng",
+        "block_size",
+        "_draw",
+        "_sum",
+        "_buffer",
+        "_next_block",
+        "_block_state",
+        "_block_length",
+        "_unpickled",
+    )
+
+    def __init__(
+        self,
+        distribution: str,
+        params: list,
+        rng: np.random.Generator,
+        block_size: int = BLOCK_SIZE,
+    ):
+        self.distribution = distribution
+        self.params = tuple(params)
+        self.rng = rng
+        self.block_size = block_size
+        self._buffer: List[float] = []
+        self._next_block = min(64, block_size)
+        self._block_state = None
+        self._block_length = 0
+        self._unpickled = 0
+        self._draw, self._sum = self._compile(distribution, self.params, rng)
+
+    @staticmethod
+    def _compile(
+        distribution: str, params: tuple, rng: np.random.Generator
+    ) -> Tuple[Callable[[int], np.ndarray], Callable[[int], float]]:
         match distribution:
             case "constant":
                 value = params[0]
+                return (
+                    lambda size: np.full(size, value, dtype=np.float64),
+                    lambda n: value * n,
+                )
             case "uniform":
                 c = params[1] * 2 * np.sqrt(3)
                 a = params[0] - (c / 2)
                 b = params[0] + (c / 2)
-                value = self.rng.uniform(a, b)
-            case "gamma":
+                return (
+                    lambda size: rng.uniform(a, b, size),
+                    lambda n: float(rng.uniform(a, b, n).sum()),
+                )
+            case "gamma" | "erlang":
                 k = params[0] ** 2 / params[1] ** 2
                 theta = params[1] ** 2 / params[0]
-                value = self.rng.gammavariate(k, theta)
-            case "erlang":
-                k = params[0] ** 2 / params[1] ** 2
-                theta = params[1] ** 2 / params[0]
-                value = self.rng.gammavariate(k, theta)
+                return (
+                    lambda size: rng.gamma(k, theta, size),
+                    lambda n: float(rng.gamma(n * k, theta)),
+                )
             case "expo":
-                value = self.rng.expovariate(1 / params[0])
+                mean = params[0]
+                return (
+                    lambda size: rng.exponential(mean, size),
+                    lambda n: float(rng.gamma(n, mean)),
+                )
             case "normal":
-                value = self.rng.normalvariate(params[0], params[1])
-            case TypeError:
-                value = 0
+                mu, sigma = params[0], params[1]
+                return (
+                    lambda size: rng.normal(mu, sigma, size),
+                    lambda n: float(rng.normal(n * mu, np.sqrt(n) * sigma)),
+                )
+            case _:
+                raise ValueError(f"Unknown distribution type {distribution}")
 
-        return np.float32(value)
+    def reseed(self, rng: np.random.Generator) -> None:
+        """Draw from `rng` from now on, dropping buffered values."""
+        self.rng = rng
+        self._buffer = []
+        self._next_block = min(64, self.block_size)
+        self._block_state = None
+        self._block_length = 0
+        self._unpickled = 0
+        self._draw, self._sum = self._compile(self.distribution, self.params, rng)
+
+    def __getstate__(self) -> dict:
+        return {
+            "distribution": self.distribution,
+            "params": self.params,
+            "rng": self.rng,
+            "block_size": self.block_size,
+            "next_block": self._next_block,
+            "block_state": self._block_state,
+            "block_length": self._block_length,
+            "buffered": len(self._buffer) or self._unpickled,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.distribution = state["distribution"]
+        self.params = state["params"]
+        self.rng = state["rng"]
+        self.block_size = state["block_size"]
+        self._next_block = state["next_block"]
+        self._block_state = state["block_state"]
+        self._block_length = state["block_length"]
+        self._draw, self._sum = self._compile(self.distribution, self.params, self.rng)
+        self._buffer = []
+        # Values left in the last block, drawn again by _refill
+        self._unpickled = state["buffered"]
+
+    def __call__(self) -> float:
+        buffer = self._buffer
+        if not buffer:
+            buffer = self._refill()
+        return buffer.pop()
+
+    def _refill(self) -> List[float]:
+        if self._unpickled:
+            rng = np.random.Generator(type(self.rng.bit_generator)())
+            rng.bit_generator.state = self._block_state
+            draw, _ = self._compile(self.distribution, self.params, rng)
+            block = draw(self._block_length)[::-1]
+            self._buffer = block[: self._unpickled].tolist()
+            self._unpickled = 0
+            return self._buffer
+
+        self._block_state = self.rng.bit_generator.state
+        self._block_length = self._next_block
+        # Reversed so values are handed out in draw order with list.pop()
+        self._buffer = self._draw(self._next_block)[::-1].tolist()
+        self._next_block = min(self._next_block * 2, self.block_size)
+        return self._buffer
+
+    def sample(self, size: int) -> np.ndarray:
+        """Draw `size` values at once, bypassing the buffer."""
+        return self._draw(size)
+
+    def sum(self, n: int) -> float:
+        """Draw the sum of `n` independent values.
+
+        Closed forms are used where the sum distribution is known (gamma,
+        erlang and expo sums are gamma, normal sums are normal, constant is
+        N*c); uniform falls back to a single vectorized block draw.
+        """
+        n = int(n)
+        if n <= 0:
+            return 0.0
+        return self._sum(n)
+
+
+class Distribution:
+    def __init__(self, seed=None, block_size: int = BLOCK_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self._samplers: Dict[Tuple[str, tuple], Sampler] = {}
+
+    def sampler(self, distribution: str, params: list) -> Sampler:
+        key = (distribution, tuple(params))
+        sampler = self._samplers.get(key)
+        if sampler is None:
+            sampler = Sampler(distribution, params, self.rng, self.block_size)
+            self._samplers[key] = sampler
+        return sampler
+
+    def random_number(self, distribution: str, params: list) -> float:
+        return self.sampler(distribution, params)()
+
+    def random_sum(self, distribution: str, params: list, n: int) -> float:
+        """Draw the sum of `n` independent values of a distribution."""
+        return self.sampler(distribution, params).sum(n)
+
+
+class RandomStreams:
+    """Registry of independent random streams derived from one seed.
+
+    Each stream is a child SeedSequence keyed by the replication index and a
+    path of names, e.g. ("demand", "produto01"). The same key always maps to
+    the same stream whatever the creation order, so replications can run in
+    any process or order and stay bit-reproducible.
+    """
+
+    def __init__(self, seed: int = None, replication: int = 0):
+        self.root = np.random.SeedSequence(seed)
+        # Resolved entropy, reproducible even when no seed was given
+        self.entropy: int = self.root.entropy
+        self.replication = replication
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _key(key: Union[str, int]) -> int:
+        if isinstance(key, int):
+            return key
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    def seed_sequence(self, *keys: Union[str, int]) -> np.random.SeedSequence:
+        spawn_key = (self.replication, *(self._key(key) for key in keys))
+        return np.random.SeedSequence(self.entropy, spawn_key=spawn_key)
+
+    def generator(self, *keys: Union[str, int]) -> np.random.Generator:
+        return np.random.default_rng(self.seed_sequence(*keys))
+
+    def distribution(
+        self, *keys: Union[str, int], block_size: int = BLOCK_SIZE
+    ) -> Distribution:
+        return Distribution(seed=self.seed_sequence(*keys), block_size=block_size)
+
+    def replication_streams(self, replication: int) -> "RandomStreams":
+        """Streams of another replication sharing the same root entropy."""
+        return RandomStreams(seed=self.entropy, replication=replication)
 
 
 class DistributionGenerator:
     def __init__(self, seed):
         self.rng = random.Random(seed)
 
-    def random_number(self, distribution: str, params: List[float, float]) -> float:
+    def random_number(self, distribution: str, params: List[float]) -> float:
         if distribution == "constant":
             value = params[0]
         elif distribution == "uniform":
@@ -1,15 +1,28 @@
+import os
+import pickle
+import time
 from pathlib import Path
-from typing import Any, Dict, Type, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
 
-import simpy
+import numpy as np
 import yaml
 
 from rlsim.engine.control import Stores
 from rlsim.engine.inbound import Inbound
+from rlsim.engine.kernel import KERNELS
 from rlsim.engine.monitor import Monitor
 from rlsim.engine.outbound import Outbound
 from rlsim.engine.production import Production
 from rlsim.engine.scheduler import Scheduler
+from rlsim.engine.state import Snapshot, wait_keys
+
+try:
+    from gymnasium import spaces
+except ImportError:
+    spaces = None
+
+# Features per candidate order: product, quantity, slack, remaining operations
+CANDIDATE_FEATURES = 4
 
 
 class Environment:
@@ -36,8 +49,19 @@ class Environment:
         inbound_kwargs: dict = None,
         outbound_kwargs: dict = None,
         seed: int = None,
+        replication: int = 0,
+        agent_dispatching: bool = False,
+        agent_release: bool = False,
+        max_candidates: int = 8,
+        reward_fn: Optional[Callable[["Environment"], float]] = None,
+        fast_reset: bool = False,
+        kernel: str = "simpy",
     ):
         super().__init__()
+        if kernel not in KERNELS:
+            raise ValueError(
+                f"Unknown kernel {kernel}, expected one of {tuple(KERNELS)}"
+            )
 
         # Store initialization parameters for reset
         self._init_params = {
@@ -62,7 +86,14 @@ class Environment:
             "inbound_kwargs": inbound_kwargs.copy() if inbound_kwargs else {},
             "outbound_kwargs": outbound_kwargs.copy() if outbound_kwargs else {},
             "seed": seed,
+            "replication": replication,
+            "agent_dispatching": agent_dispatching,
+            "agent_release": agent_release,
+            "max_candidates": max_candidates,
+            "kernel": kernel,
         }
+        self.reward_fn = reward_fn or Environment.delivery_reward
+        self.fast_reset = fast_reset
 
         self.stores_kwargs = stores_kwargs or {}
         self.monitor_kwargs = monitor_kwargs or {}
@@ -76,7 +107,8 @@ class Environment:
 
     def _initialize_environment(self):
         """Initialize or reinitialize the simulation environment"""
-        self.env = simpy.Environment()
+        self.kernel = self._init_params["kernel"]
+        self.env = KERNELS[self.kernel]()
 
         # Parameters
         self.run_until = self._init_params["run_until"]
@@ -88,6 +120,10 @@ class Environment:
         self.log_interval = self._init_params["log_interval"]
         self.training = self._init_params["training"]
         self.seed = self._init_params["seed"]
+        self.replication = self._init_params["replication"]
+        self.agent_dispatching = self._init_params["agent_dispatching"]
+        self.agent_release = self._init_params["agent_release"]
+        self.max_candidates = self._init_params["max_candidates"]
 
         # Engine components
         self.stores = self._init_params["stores"](
@@ -97,6 +133,7 @@ class Environment:
             warmup=self.warmup,
             log_interval=self.log_interval,
             seed=self.seed,
+            replication=self.replication,
             training=self.training,
             **self.stores_kwargs,
         )
@@ -106,42 +143,429 @@ class Environment:
             warmup=self.monitor_warmup,
             **self.monitor_kwargs,
         )
+        production_kwargs = dict(self.production_kwargs)
+        if self.agent_dispatching:
+            production_kwargs["agent_dispatching"] = True
         self.production = self._init_params["production"](
-            self.stores, **self.production_kwargs
-        )
-        self.scheduler = self._init_params["scheduler"](
-            self.stores, **self.scheduler_kwargs
+            self.stores, **production_kwargs
         )
+        scheduler_kwargs = dict(self.scheduler_kwargs)
+        if self.agent_release:
+            scheduler_kwargs["agent_release"] = True
+        self.scheduler = self._init_params["scheduler"](self.stores, **scheduler_kwargs)
         self.inbound = self._init_params["inbound"](self.stores, **self.inbound_kwargs)
         self.outbound = self._init_params["outbound"](
             self.stores, **self.outbound_kwargs
         )
 
-    def reset(self, seed: int = None, **kwargs):
+        self._create_spaces()
+
+    def _reset_environment(self):
+        """Start a new episode on the existing components.
+
+        Parsed config, compiled samplers, metric arrays and observation
+        buffers are kept, every component only recreates its simpy state
+        and processes, in the same order as `_initialize_environment`.
+        """
+        self.env = KERNELS[self.kernel]()
+
+        self.stores.reset(self.env, seed=self.seed, replication=self.replication)
+        self.monitor.reset()
+        self.production.reset()
+        self.scheduler.reset()
+        self.inbound.reset()
+        self.outbound.reset()
+
+        self._bind_stores()
+
+    def _create_spaces(self):
+        """Preallocate observation buffers, reused by every step.
+
+        Observation layout:
+            queued orders per resource
+            orders in process per resource
+            wip level per product
+            finished goods level per product
+            one-hot of the resource waiting for a dispatch decision, last
+                slot for a release decision
+            `max_candidates` x (product, quantity, slack, remaining operations)
+        """
+        self._resource_index = {r: i for i, r in enumerate(self.stores.resources)}
+        self._product_index = {p: i for i, p in enumerate(self.stores.products)}
+        n_resources = len(self._resource_index)
+        n_products = len(self._product_index)
+
+        self._decision_offset = 2 * n_resources + 2 * n_products
+        self._candidates_offset = self._decision_offset + n_resources + 1
+        size = self._candidates_offset + self.max_candidates * CANDIDATE_FEATURES
+
+        self.observation_size = size
+        self._obs = np.zeros(size, dtype=np.float32)
+        self._action_mask = np.zeros(self.max_candidates, dtype=bool)
+        self._bind_stores()
+
+        if spaces is not None:
+            self.observation_space = spaces.Box(
+                -np.inf, np.inf, shape=(size,), dtype=np.float32
+            )
+            self.action_space = spaces.Discrete(self.max_candidates)
+        else:
+            self.observation_space = self.action_space = None
+
+    def _bind_stores(self):
+        self._queues = [self.stores.resource_input[r] for r in self._resource_index]
+        self._wip = [self.stores.wip[p] for p in self._product_index]
+        self._finished_goods = [
+            self.stores.finished_goods[p] for p in self._product_index
+        ]
+        self._last_reward_total = 0.0
+
+    def reset(
+        self, seed: int = None, options: dict = None, **kwargs
+    ) -> Tuple[np.ndarray, dict]:
         """
         Reset the simulation environment to its initial state.
 
+        With `fast_reset`, resets that only change the seed or replication
+        reuse the existing components, see `_reset_environment`.
+
         Args:
             seed: Optional new seed for random number generation
+            options: Optional parameters to update, Gymnasium style
             **kwargs: Optional parameters to update for the reset
+
+        Returns:
+            Observation and info, at the first decision with
+            `agent_dispatching` or `agent_release`, see `step`.
         """
         # Update parameters if provided
         if seed is not None:
             self._init_params["seed"] = seed
             self.seed = seed
 
-        # Update any other parameters passed via kwargs
-        for key, value in kwargs.items():
+        # Update any other parameters passed via options or kwargs
+        updates = {**(options or {}), **kwargs}
+        for key, value in updates.items():
             if key in self._init_params:
                 self._init_params[key] = value
                 setattr(self, key, value)
 
-        # Reinitialize the environment
-        self._initialize_environment()
+        # Reuse the components unless the model itself changed
+        if self.fast_reset and updates.keys() <= {"replication"}:
+            self._reset_environment()
+        else:
+            self._initialize_environment()
+
+        if self.agent_dispatching or self.agent_release:
+            self._advance()
+        return self._observation(), self._info()
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, dict]:
+        """Answer the pending decision and run to the next one.
+
+        Decisions, told apart by `info["decision"]`:
+            dispatch, with `agent_dispatching`: a resource becomes free with
+                more than one order queued. The action is the index of the
+                order to process among the first `max_candidates` queued
+                orders (arrival order, clipped to the valid range).
+            release, with `agent_release`: a release tick of a scheduler
+                with release decisions, e.g. DBR_MTA. The action is the
+                number of candidate orders to release, highest release
+                priority first, clipped to the candidates shown.
+        Without a pending decision the simulation simply runs to `run_until`.
+
+        `terminated` is always False, the plant has no terminal state and
+        episodes end by truncation at `run_until`. The default reward reads
+        delivery metrics, which are only logged after `warmup`, so it is 0
+        for every step before the warmup ends.
+
+        The returned observation is a buffer reused by the next step, copy
+        it to keep it.
+        """
+        pending = self.stores.decisions.pending
+        if pending:
+            decision = pending.popleft()
+            candidates = decision.candidates
+            if decision.kind == "release":
+                count = min(int(action), len(candidates), self.max_candidates - 1)
+                decision.event.succeed(candidates[: max(count, 0)])
+            else:
+                index = min(int(action), len(candidates) - 1, self.max_candidates - 1)
+                decision.event.succeed(candidates[max(index, 0)])
+
+        truncated = self._advance()
+        reward = self.reward_fn(self)
+        return self._observation(), reward, False, truncated, self._info()
+
+    def _advance(self) -> bool:
+        """Run until a decision is pending, True when `run_until` is reached."""
+        env = self.env
+        pending = self.stores.decisions.pending
+        run_until = self.run_until
+
+        while not pending:
+            if env.peek() >= run_until:
+                return True
+            env.step()
+
+        # Settle the current instant, so the decision sees every order
+        # arriving at the same time
+        now = env.now
+        while env.peek() == now:
+            env.step()
+        return False
+
+    def _components(self) -> Dict[str, Any]:
+        return {
+            "stores": self.stores,
+            "monitor": self.monitor,
+            "production": self.production,
+            "scheduler": self.scheduler,
+            "inbound": self.inbound,
+            "outbound": self.outbound,
+        }
+
+    def snapshot(self) -> Snapshot:
+        """Capture the simulation state, restored with `restore`.
+
+        Events of the current instant are processed first, so every process
+        waits on a timeout, a store or an agent decision. Orders, stores,
+        random generators and process resume points are pickled, metric
+        series only keep a cursor into their arrays. A snapshot can be
+        restored any number of times, e.g. for lookahead rollouts.
+        """
+        env = self.env
+        now = env.now
+        while env.peek() == now:
+            env.step()
+
+        components = self._components()
+        owners = {id(component): name for name, component in components.items()}
+        live = self.stores.live_processes
+        processes = []
+        for process, (key, wake) in zip(
+            live, wait_keys(env, list(live), self.stores.decisions.pending)
+        ):
+            owner, method, args = live[process]
+            processes.append((key, owners[id(owner)], method, args, wake))
+        processes.sort(key=lambda process: process[0])
+
+        state = {
+            "time": now,
+            "components": {
+                name: component.get_state() for name, component in components.items()
+            },
+            "processes": [process[1:] for process in processes],
+            "reward_total": self._last_reward_total,
+        }
+        metrics = [series.cursor() for series in self.stores.metric_series()]
+        return Snapshot(now, pickle.dumps(state, pickle.HIGHEST_PROTOCOL), metrics)
+
+    def restore(self, snapshot: Snapshot) -> Tuple[np.ndarray, dict]:
+        """Return to the state of `snapshot`, taken on this environment.
 
-    def run_simulation(self):
+        Processes are started again in the order of the events they were
+        waiting on, so the run continues exactly as it did after the
+        snapshot.
+
+        Returns:
+            Observation and info, as `reset`.
+        """
+        state = pickle.loads(snapshot.state)
+        self.env = KERNELS[self.kernel](initial_time=state["time"])
+
+        components = self._components()
+        self.stores.set_state(self.env, state["components"]["stores"])
+        for name, component in components.items():
+            if name != "stores":
+                component.set_state(state["components"][name])
+
+        for series, cursor in zip(self.stores.metric_series(), snapshot.metrics):
+            series.rewind(cursor)
+
+        for owner, method, args, wake in state["processes"]:
+            self.stores.start_process(components[owner], method, *args, wake=wake)
+
+        # Let the processes recreate their waits and decisions
+        env = self.env
+        while env.peek() == env.now:
+            env.step()
+
+        self._bind_stores()
+        self._last_reward_total = state["reward_total"]
+        return self._observation(), self._info()
+
+    def reseed(self, replication: int) -> None:
+        """Continue the run on the random streams of `replication`.
+
+        Samplers draw from the start of their stream in `replication`, so
+        replications restored from one snapshot, e.g. taken after warm-up,
+        diverge from there. Values already drawn for pending events, like
+        the next demand arrival, are kept.
+        """
+        self.stores.reseed(replication)
+        self.production.reseed()
+        self.inbound.reseed()
+        self.replication = replication
+
+    def _observation(self) -> np.ndarray:
+        obs = self._obs
+        stores = self.stores
+
+        levels = [len(queue) for queue in self._queues]
+        processing = stores.processing
+        levels += [processing[r] is not None for r in self._resource_index]
+        levels += [container.level for container in self._wip]
+        levels += [container.level for container in self._finished_goods]
+        obs[: self._decision_offset] = levels
+        obs[self._decision_offset :] = 0.0
+
+        mask = self._action_mask
+        mask.fill(False)
+        if stores.decisions.pending:
+            decision = stores.decisions.pending[0]
+            if decision.kind == "release":
+                obs[self._candidates_offset - 1] = 1.0
+            else:
+                obs[self._decision_offset + self._resource_index[decision.key]] = 1.0
+
+            now = self.env.now
+            product_index = self._product_index
+            candidates = decision.candidates[: self.max_candidates]
+            features = []
+            plant = stores.plant
+            for order in candidates:
+                features += (
+                    product_index[order.product],
+                    order.quantity,
+                    0.0 if order.duedate is None else order.duedate - now,
+                    # Orders waiting for release have their whole route ahead
+                    (
+                        plant.n_steps[plant.product_ids[order.product]]
+                        if order.process_total is None
+                        else order.process_total - order.process_finished
+                    ),
+                )
+            start = self._candidates_offset
+            obs[start : start + len(features)] = features
+            if decision.kind == "release":
+                # Release 0 to len(candidates) orders
+                mask[: len(candidates) + 1] = True
+            else:
+                mask[: len(candidates)] = True
+
+        return obs
+
+    def _info(self) -> dict:
+        pending = self.stores.decisions.pending
+        decision = pending[0] if pending else None
+        return {
+            "time": self.env.now,
+            "decision": decision.kind if decision else None,
+            "resource": (
+                decision.key if decision and decision.kind == "dispatch" else None
+            ),
+            "action_mask": self._action_mask,
+        }
+
+    @staticmethod
+    def delivery_reward(environment: "Environment") -> float:
+        """Change since the last step of on-time deliveries minus late
+        deliveries and lost sales, in quantity.
+        """
+        log = environment.stores.log_products
+        total = 0.0
+        for product in environment.stores.products:
+            total += log.delivered_ontime[product].sum
+            total -= log.delivered_late[product].sum + log.lost_sales[product].sum
+        reward = total - environment._last_reward_total
+        environment._last_reward_total = total
+        return reward
+
+    def run_simulation(
+        self,
+        checkpoint_path: Union[str, Path, None] = None,
+        checkpoint_interval: Optional[float] = None,
+        checkpoint_wall_interval: Optional[float] = None,
+        resume: bool = False,
+    ):
+        """Run until `run_until`.
+
+        With `checkpoint_path` the run saves a checkpoint there every
+        `checkpoint_interval` simulated hours and every
+        `checkpoint_wall_interval` wall seconds. With `resume` it first
+        continues from that checkpoint if it exists. Checkpoints do not
+        change the run, a resumed run ends with the same results as an
+        uninterrupted one.
+        """
         print(self.run_until)
-        self.env.run(until=self.run_until)
+        if checkpoint_path is None:
+            self.env.run(until=self.run_until)
+            return
+
+        if resume and Path(checkpoint_path).exists():
+            self.load_checkpoint(checkpoint_path)
+            print(f"Resumed from {checkpoint_path} at {self.env.now}")
+
+        deadline = None
+        while self.env.now < self.run_until:
+            until = self.run_until
+            if checkpoint_interval:
+                periods = self.env.now // checkpoint_interval + 1
+                until = min(until, periods * checkpoint_interval)
+            if checkpoint_wall_interval and deadline is None:
+                deadline = time.monotonic() + checkpoint_wall_interval
+
+            if self._run_until(until, deadline) and until == self.run_until:
+                break
+            self.save_checkpoint(checkpoint_path)
+            deadline = None
+
+    def _run_until(self, until: float, deadline: Optional[float]) -> bool:
+        """Run to `until`, or stop early once the wall clock passes
+        `deadline`. Returns whether `until` was reached.
+        """
+        env = self.env
+        if deadline is None:
+            env.run(until=until)
+            return True
+
+        while env.peek() < until:
+            for _ in range(1000):
+                if env.peek() >= until:
+                    break
+                env.step()
+            if time.monotonic() >= deadline:
+                return False
+        env.run(until=until)
+        return True
+
+    def save_checkpoint(self, path: Union[str, Path]) -> None:
+        """Write a snapshot with its metrics to `path`, see `load_checkpoint`.
+
+        The file is replaced atomically, an interrupted write keeps the
+        previous checkpoint.
+        """
+        path = Path(path)
+        checkpoint = {"snapshot": self.snapshot(), "replication": self.replication}
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(checkpoint, file, pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path: Union[str, Path]) -> Tuple[np.ndarray, dict]:
+        """Continue from a checkpoint written by `save_checkpoint` on an
+        environment with the same configuration.
+
+        Returns:
+            Observation and info, as `reset`.
+        """
+        with open(path, "rb") as file:
+            checkpoint = pickle.load(file)
+        self.replication = checkpoint["replication"]
+        return self.restore(checkpoint["snapshot"])
 
     def save_parameters(self, save_folder: Union[str, Path]):
         if not isinstance(save_folder, Path):
@@ -159,7 +583,10 @@ class Environment:
             "monitor_interval": self.monitor_interval,
             "log_interval": self.log_interval,
             "training": self.training,
+            "kernel": self.kernel,
             "seed": self.seed,
+            "replication": self.replication,
+            "entropy": self.stores.streams.entropy,
             "stores_kwargs": self.stores_kwargs,
             "monitor_kwargs": self.monitor_kwargs,
             "production_kwargs": self.production_kwargs,
@@ -167,7 +594,7 @@ class Environment:
             "inbound_kwargs": self.inbound_kwargs,
             "outbound_kwargs": self.outbound_kwargs,
         }
-        with open(save_folder / "config_products.yaml", "w") as file:
+        with open(save_folder / "params.yaml", "w") as file:
             yaml.dump(params, file)
 
 
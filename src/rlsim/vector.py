@@ -0,0 +1,399 @@
+import multiprocessing as mp
+import traceback
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rlsim.environment import Environment
+
+
+class StepBuffers:
+    """Typed NumPy views over one block, one row per environment.
+
+    With `shared` the block is a SharedMemory segment, created when `name`
+    is None and attached otherwise.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        obs_size: int,
+        max_candidates: int,
+        shared: bool = False,
+        name: Optional[str] = None,
+    ):
+        layout = [
+            ("observations", np.float32, (num_envs, obs_size)),
+            ("final_observations", np.float32, (num_envs, obs_size)),
+            ("action_masks", np.bool_, (num_envs, max_candidates)),
+            ("rewards", np.float64, (num_envs,)),
+            ("times", np.float64, (num_envs,)),
+            ("actions", np.int64, (num_envs,)),
+            ("resources", np.int64, (num_envs,)),
+            ("terminated", np.bool_, (num_envs,)),
+            ("truncated", np.bool_, (num_envs,)),
+        ]
+        offsets = []
+        size = 0
+        for _, dtype, shape in layout:
+            # Keep every array aligned to 8 bytes
+            size = -(-size // 8) * 8
+            offsets.append(size)
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+        self.shm = None
+        if not shared:
+            buffer = bytearray(size)
+        elif name is None:
+            self.shm = SharedMemory(create=True, size=size)
+            buffer = self.shm.buf
+        else:
+            self.shm = SharedMemory(name=name)
+            buffer = self.shm.buf
+
+        for (field, dtype, shape), offset in zip(layout, offsets):
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            setattr(self, field, array)
+
+    def close(self, unlink: bool = False) -> None:
+        # Drop the views before releasing the buffer
+        for field in list(vars(self)):
+            if field != "shm":
+                delattr(self, field)
+        if self.shm is not None:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+
+
+class EpisodeRunner:
+    """Steps one environment and writes the results into row `index`.
+
+    Finished episodes reset automatically. Episode e of environment i runs
+    `seed` with replication `i + e * num_envs`, so every episode has
+    independent, reproducible random streams.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        buffers: StepBuffers,
+        index: int,
+        num_envs: int,
+        seed: int,
+    ):
+        self.env = env
+        self.buffers = buffers
+        self.index = index
+        self.num_envs = num_envs
+        self.seed = seed
+        self.episode = 0
+        self._resources = {r: i for i, r in enumerate(env.stores.resources)}
+
+    def _reset_episode(self):
+        obs, info = self.env.reset(
+            seed=self.seed,
+            options={"replication": self.index + self.episode * self.num_envs},
+        )
+        self.episode += 1
+        return obs, info
+
+    def _write(self, obs, info) -> None:
+        buffers, index = self.buffers, self.index
+        buffers.observations[index] = obs
+        buffers.action_masks[index] = info["action_mask"]
+        buffers.times[index] = info["time"]
+        resource = info["resource"]
+        buffers.resources[index] = -1 if resource is None else self._resources[resource]
+
+    def reset(self) -> None:
+        self.episode = 0
+        obs, info = self._reset_episode()
+        self.buffers.rewards[self.index] = 0.0
+        self.buffers.terminated[self.index] = False
+        self.buffers.truncated[self.index] = False
+        self._write(obs, info)
+
+    def step(self, action: int) -> None:
+        buffers, index = self.buffers, self.index
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        buffers.rewards[index] = reward
+        buffers.terminated[index] = terminated
+        buffers.truncated[index] = truncated
+        if terminated or truncated:
+            buffers.final_observations[index] = obs
+            obs, info = self._reset_episode()
+        self._write(obs, info)
+
+
+def _worker(
+    index: int,
+    num_envs: int,
+    env_fn: Callable[[], Environment],
+    seed: int,
+    conn,
+) -> None:
+    buffers = None
+    try:
+        env = env_fn()
+        conn.send(("ready", (env.observation_size, env.max_candidates)))
+        buffers = StepBuffers(
+            num_envs,
+            env.observation_size,
+            env.max_candidates,
+            shared=True,
+            name=conn.recv(),
+        )
+        runner = EpisodeRunner(env, buffers, index, num_envs, seed)
+
+        while True:
+            command = conn.recv()
+            match command:
+                case "reset":
+                    runner.reset()
+                case "step":
+                    runner.step(buffers.actions[index])
+                case "close":
+                    conn.send(("closed", None))
+                    break
+            conn.send(("ok", None))
+
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        if buffers is not None:
+            buffers.close()
+        conn.close()
+
+
+class VectorEnvironment:
+    """Run `num_envs` environments in subprocess workers.
+
+    Observations, rewards, flags and action masks live in one shared memory
+    block written by the workers, only short commands go through the pipes.
+    Environments reset automatically when an episode ends, the last
+    observation of the finished episode is kept in `final_observations`,
+    and seeds follow `EpisodeRunner`.
+
+    `env_fn` builds the environment inside the worker and must be picklable
+    for the spawn start method, e.g. a module level function or a partial.
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable[[], Environment],
+        num_envs: int,
+        seed: Optional[int] = None,
+        context: Optional[str] = None,
+    ):
+        self.num_envs = num_envs
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self._waiting = False
+        self._closed = False
+
+        # Workers inherit the running tracker and attach to the block created
+        # here, so it is tracked once and unlinked by close
+        resource_tracker.ensure_running()
+        ctx = mp.get_context(context)
+        self._conns = []
+        self._processes = []
+        for index in range(num_envs):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(index, num_envs, env_fn, self.seed, child_conn),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+        try:
+            sizes = set(self._receive_all())
+            if len(sizes) != 1:
+                raise ValueError(f"Environments have different spaces {sizes}")
+            self.obs_size, self.max_candidates = sizes.pop()
+
+            self.buffers = StepBuffers(
+                num_envs, self.obs_size, self.max_candidates, shared=True
+            )
+            for conn in self._conns:
+                conn.send(self.buffers.shm.name)
+        except Exception:
+            self._terminate()
+            raise
+
+    def _receive_all(self) -> List:
+        results = []
+        errors = []
+        for index, conn in enumerate(self._conns):
+            status, value = conn.recv()
+            if status == "error":
+                errors.append(f"Worker {index}:\n{value}")
+            results.append(value)
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return results
+
+    def _info(self) -> Dict[str, np.ndarray]:
+        return {
+            "time": self.buffers.times,
+            "resource": self.buffers.resources,
+            "action_mask": self.buffers.action_masks,
+            "final_observation": self.buffers.final_observations,
+        }
+
+    def reset(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Reset every environment to its first episode.
+
+        Returned arrays are views of the shared block, overwritten by the
+        next call, copy them to keep them.
+        """
+        for conn in self._conns:
+            conn.send("reset")
+        self._receive_all()
+        return self.buffers.observations, self._info()
+
+    def step_async(self, actions) -> None:
+        if self._waiting:
+            raise RuntimeError("step_async called before step_wait")
+        self.buffers.actions[:] = actions
+        for conn in self._conns:
+            conn.send("step")
+        self._waiting = True
+
+    def step_wait(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        if not self._waiting:
+            raise RuntimeError("step_wait called without step_async")
+        self._waiting = False
+        self._receive_all()
+        buffers = self.buffers
+        return (
+            buffers.observations,
+            buffers.rewards,
+            buffers.terminated,
+            buffers.truncated,
+            self._info(),
+        )
+
+    def step(
+        self, actions
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def _terminate(self) -> None:
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
+
+    def close(self) -> None:
+        if self._closed or not hasattr(self, "_processes"):
+            return
+        self._closed = True
+        try:
+            if self._waiting:
+                self._receive_all()
+            for conn in self._conns:
+                conn.send("close")
+            for conn in self._conns:
+                conn.recv()
+        except (EOFError, OSError, RuntimeError):
+            pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._terminate()
+        for conn in self._conns:
+            conn.close()
+        if hasattr(self, "buffers"):
+            self.buffers.close(unlink=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class BatchEnvironment:
+    """Step `num_envs` independent environments in lockstep in one process.
+
+    Every step advances each environment to its next decision and returns
+    stacked arrays, so one policy forward pass serves the whole batch
+    without IPC. Results, auto-reset and seeds follow `VectorEnvironment`.
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable[[], Environment],
+        num_envs: int,
+        seed: Optional[int] = None,
+    ):
+        self.num_envs = num_envs
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.envs = [env_fn() for _ in range(num_envs)]
+
+        sizes = {(env.observation_size, env.max_candidates) for env in self.envs}
+        if len(sizes) != 1:
+            raise ValueError(f"Environments have different spaces {sizes}")
+        self.obs_size, self.max_candidates = sizes.pop()
+
+        self.buffers = StepBuffers(num_envs, self.obs_size, self.max_candidates)
+        self.runners = [
+            EpisodeRunner(env, self.buffers, index, num_envs, self.seed)
+            for index, env in enumerate(self.envs)
+        ]
+
+    def _info(self) -> Dict[str, np.ndarray]:
+        return {
+            "time": self.buffers.times,
+            "resource": self.buffers.resources,
+            "action_mask": self.buffers.action_masks,
+            "final_observation": self.buffers.final_observations,
+        }
+
+    def reset(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Reset every environment to its first episode.
+
+        Returned arrays are overwritten by the next call, copy them to keep
+        them.
+        """
+        for runner in self.runners:
+            runner.reset()
+        return self.buffers.observations, self._info()
+
+    def step(
+        self, actions
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        buffers = self.buffers
+        buffers.actions[:] = actions
+        for runner, action in zip(self.runners, buffers.actions.tolist()):
+            runner.step(action)
+        return (
+            buffers.observations,
+            buffers.rewards,
+            buffers.terminated,
+            buffers.truncated,
+            self._info(),
+        )
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
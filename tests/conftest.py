@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from rlsim.environment import Environment, load_config
+
+ROOT = Path(__file__).resolve().parents[1]
+DBR_PATH = ROOT / "simulations" / "dbr_mta"
+sys.path.insert(0, str(DBR_PATH))
+
+from scheduler import DBR_MTA  # noqa: E402
+from stores import DBR_stores  # noqa: E402
+
+
+@pytest.fixture
+def dbr_environment():
+    """Build an Environment of the DBR plant, keyword arguments override
+    the defaults.
+    """
+
+    def build(**kwargs) -> Environment:
+        params = dict(
+            run_until=10**9,
+            resources_cfg=load_config(DBR_PATH / "config" / "resources.yaml"),
+            products_cfg=load_config(DBR_PATH / "config" / "products.yaml"),
+            stores=DBR_stores,
+            scheduler=DBR_MTA,
+            scheduler_kwargs={
+                "schedule_interval": 72,
+                "constraint_buffer_size": float("inf"),
+                "ccr_release_limit": float("inf"),
+            },
+            outbound_kwargs={"delivery_mode": "instantly"},
+            seed=0,
+        )
+        params.update(kwargs)
+        return Environment(**params)
+
+    return build
+
+
+@pytest.fixture
+def example_environment():
+    """Build an Environment of the example plant."""
+
+    def build(**kwargs) -> Environment:
+        params = dict(
+            run_until=10**9,
+            resources_cfg=load_config(ROOT / "example" / "config" / "resources.yaml"),
+            products_cfg=load_config(ROOT / "example" / "config" / "products.yaml"),
+            seed=0,
+        )
+        params.update(kwargs)
+        return Environment(**params)
+
+    return build
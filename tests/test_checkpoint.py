@@ -0,0 +1,43 @@
+import pytest
+
+RUN_UNTIL = 5000
+STOP_AT = 2500
+WARMUP = 500
+
+
+def results(env) -> tuple:
+    return env.monitor.measure_products(), env.monitor.measure_resources()
+
+
+@pytest.mark.parametrize(
+    "checkpoints",
+    [{"checkpoint_interval": 700}, {"checkpoint_wall_interval": 1e-9}],
+    ids=["interval", "deadline"],
+)
+def test_resumed_run_matches_uninterrupted_run(dbr_environment, tmp_path, checkpoints):
+    uninterrupted = dbr_environment(run_until=RUN_UNTIL, warmup=WARMUP)
+    uninterrupted.run_simulation()
+
+    path = tmp_path / "run.ckpt"
+    # Stopped before the end, as a preempted run
+    stopped = dbr_environment(run_until=STOP_AT, warmup=WARMUP)
+    stopped.run_simulation(checkpoint_path=path, **checkpoints)
+    assert path.exists()
+
+    resumed = dbr_environment(run_until=RUN_UNTIL, warmup=WARMUP)
+    resumed.run_simulation(checkpoint_path=path, resume=True, **checkpoints)
+    assert resumed.env.now == RUN_UNTIL
+
+    for expected, frame in zip(results(uninterrupted), results(resumed)):
+        assert expected.equals(frame)
+
+
+def test_resume_without_checkpoint_starts_over(dbr_environment, tmp_path):
+    uninterrupted = dbr_environment(run_until=STOP_AT, warmup=WARMUP)
+    uninterrupted.run_simulation()
+
+    fresh = dbr_environment(run_until=STOP_AT, warmup=WARMUP)
+    fresh.run_simulation(checkpoint_path=tmp_path / "run.ckpt", resume=True)
+
+    for expected, frame in zip(results(uninterrupted), results(fresh)):
+        assert expected.equals(frame)
@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+
+from rlsim.engine.kernel import KERNELS
+
+RUN_UNTIL = 8000
+WARMUP = 1000
+SNAPSHOT_AT = 3000.5
+
+
+@pytest.fixture(params=["dbr", "example"])
+def plant(request, dbr_environment, example_environment):
+    if request.param == "dbr":
+        return dbr_environment
+    return example_environment
+
+
+def results(env) -> tuple:
+    return env.monitor.measure_products(), env.monitor.measure_resources()
+
+
+def assert_same_results(a: tuple, b: tuple) -> None:
+    for frame_a, frame_b in zip(a, b):
+        assert frame_a.equals(frame_b)
+
+
+def test_unknown_kernel(example_environment):
+    with pytest.raises(ValueError):
+        example_environment(kernel="fast")
+
+
+def test_kernels_give_the_same_run(plant):
+    runs = {}
+    for kernel in KERNELS:
+        env = plant(run_until=RUN_UNTIL, warmup=WARMUP, kernel=kernel)
+        env.env.run(until=RUN_UNTIL)
+        runs[kernel] = (next(env.env._eid), results(env))
+
+    (events, frames), (light_events, light_frames) = runs.values()
+    assert events == light_events
+    assert_same_results(frames, light_frames)
+
+
+@pytest.mark.parametrize("kernel", tuple(KERNELS))
+def test_snapshot_restores_the_run(plant, kernel):
+    env = plant(run_until=RUN_UNTIL, warmup=WARMUP, kernel=kernel)
+    env.env.run(until=SNAPSHOT_AT)
+    snapshot = env.snapshot()
+    env.env.run(until=RUN_UNTIL)
+    expected = results(env)
+
+    env.restore(snapshot)
+    env.env.run(until=RUN_UNTIL)
+    assert_same_results(expected, results(env))
+
+    # Restored in a fresh environment, from a pickled snapshot
+    other = plant(run_until=RUN_UNTIL, warmup=WARMUP, kernel=kernel)
+    other.restore(pickle.loads(pickle.dumps(snapshot)))
+    other.env.run(until=RUN_UNTIL)
+    assert_same_results(expected, results(other))
+
+
+def test_agent_steps_match_across_kernels(dbr_environment):
+    trajectories = []
+    for kernel in KERNELS:
+        env = dbr_environment(agent_dispatching=True, kernel=kernel)
+        env.reset(seed=0)
+        trajectory = []
+        for step in range(500):
+            obs, reward, _, _, info = env.step(step % env.max_candidates)
+            trajectory.append((info["time"], reward, obs.tobytes()))
+        trajectories.append(trajectory)
+    assert trajectories[0] == trajectories[1]
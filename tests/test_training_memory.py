@@ -0,0 +1,53 @@
+import gc
+import random
+import tracemalloc
+
+from rlsim.engine import utils
+
+WINDOWS = 4
+STEPS = 2500
+# Peak growth allowed between the first and the second half of the windows
+TOLERANCE = 1024 * 1024
+
+
+def traced_memory() -> int:
+    """Traced bytes, without the sampler prefetch blocks."""
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, utils.__file__)]
+    )
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def test_training_episode_runs_in_constant_memory(dbr_environment):
+    # Same check as benchmarks/check_training_memory.py, on fewer steps
+    env = dbr_environment(training=True, agent_dispatching=True)
+    env.reset(seed=0)
+    rng = random.Random(0)
+
+    tracemalloc.start()
+    try:
+        memory = []
+        for _ in range(WINDOWS):
+            for _ in range(STEPS):
+                _, _, terminated, truncated, _ = env.step(
+                    rng.randrange(env.max_candidates)
+                )
+                assert not (terminated or truncated)
+            memory.append(traced_memory())
+    finally:
+        tracemalloc.stop()
+
+    half = len(memory) // 2
+    assert max(memory[half:]) - max(memory[:half]) < TOLERANCE
+
+
+def test_training_metrics_keep_no_samples(dbr_environment):
+    env = dbr_environment(training=True, warmup=100)
+    env.env.run(until=5000)
+
+    for table in (env.stores.log_products, env.stores.log_resources):
+        arrays = table.to_arrays()
+        assert len(arrays["time"]) == 0
+    delivered = env.stores.log_products.delivered_ontime
+    assert sum(len(series) for series in delivered.values()) > 0